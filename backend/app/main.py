@@ -1,23 +1,41 @@
 # backend/app/main.py
+import asyncio
 from fastapi import FastAPI
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 import logging
-from routes import analysis, user_tweets
-from db.database import get_supabase_client
+import logging.config
 
-# Set up logging
-logging.basicConfig(level=logging.INFO)
+# Set up logging once for the whole app; modules only create their own loggers.
+# Configured before the routers are imported so their import-time logs are kept.
+logging.config.dictConfig({
+    "version": 1,
+    "disable_existing_loggers": False,  # Keep the module loggers created at import time
+    "formatters": {
+        "default": {"format": "%(asctime)s - %(name)s - %(levelname)s - %(message)s"},
+    },
+    "handlers": {
+        "console": {"class": "logging.StreamHandler", "formatter": "default"},
+    },
+    "root": {"level": "INFO", "handlers": ["console"]},
+})
 logger = logging.getLogger(__name__)
 
-app = FastAPI(title="Twitter Sentiment Analysis API")
+from routes import analysis, user_tweets
+from db.database import get_supabase_client
+from core.config import settings
+
+# orjson serializes the large tweet lists in responses much faster than the stdlib json encoder
+app = FastAPI(title="Twitter Sentiment Analysis API", default_response_class=ORJSONResponse)
 
 # Configure CORS
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=["*"],  # Allows all origins
+    allow_origins=settings.CORS_ORIGINS,  # Only the configured frontend origins
     allow_credentials=True,
-    allow_methods=["*"],  # Allows all methods
-    allow_headers=["*"],  # Allows all headers
+    allow_methods=["GET", "POST"],  # The only methods the API exposes
+    allow_headers=["Content-Type", "Authorization"],
 )
 
 # Include routers
@@ -27,16 +45,20 @@ app.include_router(user_tweets.router, prefix="/api", tags=["user-tweets"])
 @app.on_event("startup")
 async def startup():
     """
-    Initialize Supabase client and verify connection on startup
+    Initialize Supabase client, verify connection and warm the connection pool on startup
     """
     try:
         # Test Supabase connection
         supabase = get_supabase_client()
-        # Try a simple query to verify connection
-        supabase.table("analyses").select("*").limit(1).execute()
+
+        def ping():
+            return supabase.table("analyses").select("analysis_id").limit(1).execute()
+
+        # Run one simple query per pooled connection so the first requests don't pay the TCP+TLS handshake
+        await asyncio.gather(*[run_in_threadpool(ping) for _ in range(settings.SUPABASE_MAX_CONNECTIONS)])
         logger.info("Successfully connected to Supabase")
     except Exception as e:
-        logger.error(f"Failed to connect to Supabase: {e}")
+        logger.error("Failed to connect to Supabase: %s", e)
         raise
 
 @app.get("/")
@@ -1,18 +1,36 @@
 import os
+from functools import lru_cache
+from typing import Final, List
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
 load_dotenv()
 
 class Settings:
-    TWIKIT_COOKIES_FILE: str = os.getenv("TWIKIT_COOKIES_FILE", "cookies.json")
-    DEFAULT_TWEET_COUNT: int = int(os.getenv("DEFAULT_TWEET_COUNT", "50"))
-    MAX_TWEET_COUNT: int = int(os.getenv("MAX_TWEET_COUNT", "200"))
-    SUPABASE_URL: str = os.getenv("SUPABASE_URL")  # Supabase URL from your project settings
-    SUPABASE_API_KEY: str = os.getenv("SUPABASE_API_KEY") # Supabase API Key (anon or service_role)
-    DATABASE_URL: str = os.getenv("DATABASE_URL") # Directly use DATABASE_URL from Supabase if provided
+    # Environment variables are read once per process; the values never change afterwards
+    TWIKIT_COOKIES_FILE: Final[str] = os.getenv("TWIKIT_COOKIES_FILE", "cookies.json")
+    DEFAULT_TWEET_COUNT: Final[int] = int(os.getenv("DEFAULT_TWEET_COUNT", "50"))
+    MAX_TWEET_COUNT: Final[int] = int(os.getenv("MAX_TWEET_COUNT", "200"))
+    SUPABASE_URL: Final[str] = os.getenv("SUPABASE_URL")  # Supabase URL from your project settings
+    SUPABASE_API_KEY: Final[str] = os.getenv("SUPABASE_API_KEY") # Supabase API Key (anon or service_role)
+    DATABASE_URL: Final[str] = os.getenv("DATABASE_URL") # Directly use DATABASE_URL from Supabase if provided
+    DATABASE_POOL_MAX_CONNECTIONS: Final[int] = int(os.getenv("DATABASE_POOL_MAX_CONNECTIONS", "2")) # Direct Postgres connections kept for bulk COPY loads
+    SUPABASE_MAX_CONNECTIONS: Final[int] = int(os.getenv("SUPABASE_MAX_CONNECTIONS", "10")) # Size of the shared HTTP connection pool to Supabase
+    SUPABASE_KEEPALIVE_EXPIRY: Final[float] = float(os.getenv("SUPABASE_KEEPALIVE_EXPIRY", "60")) # Seconds an idle pooled connection is kept open
+    SENTIMENT_ONNX_MODEL_DIR: Final[str] = os.getenv("SENTIMENT_ONNX_MODEL_DIR", "") # Directory of the exported ONNX sentiment model; empty keeps the PyTorch model
+    SENTIMENT_ONNX_FILE: Final[str] = os.getenv("SENTIMENT_ONNX_FILE", "model_int8.onnx") # Quantized model file inside SENTIMENT_ONNX_MODEL_DIR
+    SENTIMENT_TORCH_COMPILE: Final[bool] = os.getenv("SENTIMENT_TORCH_COMPILE", "false").lower() in ("1", "true", "yes") # Compile the PyTorch sentiment model with torch.compile
+    SENTIMENT_CACHE_SIZE: Final[int] = int(os.getenv("SENTIMENT_CACHE_SIZE", "50000")) # Sentiment results kept in memory per process, keyed by text hash
+    CORS_ORIGINS: Final[List[str]] = [origin.strip() for origin in os.getenv("CORS_ORIGINS", "http://localhost:3000,http://127.0.0.1:3000").split(",") if origin.strip()] # Comma-separated frontend origins allowed by CORS
 
-settings = Settings()
+@lru_cache()
+def get_settings() -> Settings:
+    """
+    Returns the settings instance, created only once per process.
+    """
+    return Settings()
+
+settings = get_settings()
 
 # Print diagnostic information about environment variables
 if not settings.SUPABASE_URL:
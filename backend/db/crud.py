@@ -1,14 +1,19 @@
 # backend/db/crud.py
 from fastapi import Query
-from typing import List, Dict, Optional, Any
+from typing import List, Dict, Optional, Any, Iterator, Set
 import logging
 from supabase import Client
-from datetime import datetime
-from collections import defaultdict
-from dateutil import parser
+from datetime import datetime, timedelta
+from collections import Counter, defaultdict
+from operator import itemgetter
+import threading
+import csv
+import io
+from cachetools import TTLCache
+import psycopg2
+from psycopg2.pool import PoolError
+from db.database import get_pg_pool
 
-# Set up logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 # Table names in Supabase
@@ -16,6 +21,49 @@ ANALYSES_TABLE = "analyses"
 TWEETS_TABLE = "tweets"
 GRAPH_DATA_TABLE = "graph_data"
 
+# Columns read back from Supabase, so queries don't ship whole rows
+ANALYSIS_REPORT_COLUMNS = "analysis_id, username, analysis_timestamp, positive_sentiment_percentage, neutral_sentiment_percentage, negative_sentiment_percentage, tweet_count"
+TWEET_RESPONSE_COLUMNS = "tweet_id, type, text, username, created_at, sentiment, sentiment_score"
+
+# Max rows per bulk write; PostgREST/Postgres gain nothing from bigger batches
+BULK_WRITE_BATCH_SIZE = 1000
+
+# IDs per existence check; keeps the IN (...) filter well within URL length limits
+EXISTENCE_CHECK_BATCH_SIZE = 200
+
+# Larger tweet loads go through Postgres COPY on DATABASE_URL instead of the REST API
+COPY_THRESHOLD_ROWS = 2000
+TWEET_COPY_COLUMNS = ("tweet_id", "analysis_id", "type", "username", "text", "created_at", "sentiment", "sentiment_score")
+COPY_NULL = r"\N"  # Unquoted empty CSV fields are NULL by default; this keeps empty strings as '' like the REST path
+
+# Sentiment labels stored in the tweets table
+VALID_SENTIMENTS = frozenset({"positive", "neutral", "negative"})
+
+# Per-user aggregates only change when a new analysis is stored, so they are cached for a short while.
+# The cache is per process: with several uvicorn workers each keeps its own copy.
+AGGREGATE_CACHE_TTL = 60  # seconds
+_aggregate_cache = TTLCache(maxsize=1024, ttl=AGGREGATE_CACHE_TTL)
+_aggregate_cache_lock = threading.Lock()  # Routes call crud from the threadpool
+
+def _get_cached_aggregate(key: tuple) -> Optional[Dict]:
+    with _aggregate_cache_lock:
+        return _aggregate_cache.get(key)
+
+def _set_cached_aggregate(key: tuple, value: Dict) -> None:
+    with _aggregate_cache_lock:
+        _aggregate_cache[key] = value
+
+def _invalidate_cached_aggregates(username: str) -> None:
+    """Drops every cached aggregate of a username; keys are (kind, username, ...)."""
+    with _aggregate_cache_lock:
+        for key in [key for key in _aggregate_cache if key[1] == username]:
+            _aggregate_cache.pop(key, None)
+
+def _chunked(rows: List[Any], size: int) -> Iterator[List[Any]]:
+    """Splits rows into consecutive lists of at most size rows."""
+    for start in range(0, len(rows), size):
+        yield rows[start:start + size]
+
 def create_analysis(supabase: Client, username: str, query_parameters: Dict) -> Dict[str, Any]:
     """
     Create a new analysis record in the database.
@@ -30,22 +78,24 @@ def create_analysis(supabase: Client, username: str, query_parameters: Dict) ->
     """
     try:
         # Create a new analysis record
+        analysis_timestamp = datetime.now().isoformat()
         data = {
             "username": username,
             "query_parameters": query_parameters,
-            "analysis_timestamp": datetime.now().isoformat()
+            "analysis_timestamp": analysis_timestamp
         }
         
         response = supabase.table(ANALYSES_TABLE).insert(data).execute()
         
         if len(response.data) > 0:
-            logger.info(f"Created analysis for user {username}")
+            logger.info("Created analysis for user %s", username)
+            _invalidate_cached_aggregates(username)
             return response.data[0]
         else:
             logger.error("Failed to create analysis record")
             raise Exception("Failed to create analysis record")
     except Exception as e:
-        logger.error(f"Error creating analysis: {e}")
+        logger.error("Error creating analysis: %s", e)
         raise
 
 def update_analysis_summary(supabase: Client, analysis_id: int, summary: Dict, tweet_count: int) -> Dict[str, Any]:
@@ -72,77 +122,116 @@ def update_analysis_summary(supabase: Client, analysis_id: int, summary: Dict, t
         response = supabase.table(ANALYSES_TABLE).update(data).eq("analysis_id", analysis_id).execute()
         
         if len(response.data) > 0:
-            logger.info(f"Updated analysis {analysis_id} with sentiment summary")
+            logger.info("Updated analysis %s with sentiment summary", analysis_id)
+            # The analysis' tweets are stored by now, drop aggregates cached while they were being written
+            _invalidate_cached_aggregates(response.data[0]["username"])
             return response.data[0]
         else:
-            logger.error(f"Failed to update analysis {analysis_id}")
+            logger.error("Failed to update analysis %s", analysis_id)
             raise Exception(f"Failed to update analysis {analysis_id}")
     except Exception as e:
-        logger.error(f"Error updating analysis: {e}")
+        logger.error("Error updating analysis: %s", e)
         raise
 
-def create_tweet(supabase: Client, tweet_data: Dict, analysis_id: int) -> Dict[str, Any]:
+def _tweet_row(tweet_data: Dict, analysis_id: int) -> Dict[str, Any]:
+    """Maps prepared tweet data onto a row of the tweets table."""
+    created_at = tweet_data["created_at"]
+    return {
+        "tweet_id": tweet_data["tweet_id"],
+        "analysis_id": analysis_id,
+        "type": tweet_data["type"],
+        "username": tweet_data["username"],
+        "text": tweet_data["text"],
+        "created_at": created_at.isoformat() if isinstance(created_at, datetime) else created_at,
+        "sentiment": tweet_data["sentiment"],
+        "sentiment_score": tweet_data["score"]
+    }
+
+def _copy_tweet_rows(pool, rows: List[Dict[str, Any]]) -> int:
     """
-    Create a new tweet record in the database.
-    If the tweet already exists, it will be skipped and the existing record will be returned.
-    
+    Loads tweet rows with COPY into a temporary table, then moves them into tweets with ON CONFLICT DO NOTHING.
+    Runs as one transaction on a direct Postgres connection and returns the number of inserted rows.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerows([COPY_NULL if row[column] is None else row[column] for column in TWEET_COPY_COLUMNS] for row in rows)
+    buffer.seek(0)
+
+    columns = ", ".join(TWEET_COPY_COLUMNS)
+    conn = pool.getconn()
+    try:
+        with conn, conn.cursor() as cursor:
+            cursor.execute(f"CREATE TEMP TABLE tweets_load (LIKE {TWEETS_TABLE} INCLUDING DEFAULTS) ON COMMIT DROP")
+            cursor.copy_expert(f"COPY tweets_load ({columns}) FROM STDIN WITH (FORMAT csv, NULL '{COPY_NULL}')", buffer)
+            cursor.execute(
+                f"INSERT INTO {TWEETS_TABLE} ({columns}) SELECT {columns} FROM tweets_load "
+                "ON CONFLICT (tweet_id) DO NOTHING"
+            )
+            return cursor.rowcount
+    finally:
+        pool.putconn(conn, close=bool(conn.closed))
+
+def create_tweets_bulk(supabase: Client, tweets_data: List[Dict], analysis_id: int) -> int:
+    """
+    Create tweet records in the database with bulk upserts of BULK_WRITE_BATCH_SIZE rows.
+    Tweets that already exist (same tweet_id) are skipped by the database via ON CONFLICT.
+    Loads above COPY_THRESHOLD_ROWS use Postgres COPY when DATABASE_URL is configured,
+    falling back to the upserts if the direct connection fails.
+
     Args:
         supabase: Supabase client
-        tweet_data: Tweet data including id, type, username, text, created_at, sentiment, and score
-        analysis_id: ID of the analysis this tweet belongs to
-        
+        tweets_data: List of tweet data including tweet_id, type, username, text, created_at, sentiment, and score
+        analysis_id: ID of the analysis these tweets belong to
+
     Returns:
-        The created tweet record or the existing one if already in database
+        Number of newly created tweet records
     """
+    if not tweets_data:
+        return 0
+
     try:
-        # Check if the tweet already exists
-        existing_tweet = supabase.table(TWEETS_TABLE).select("*").eq("tweet_id", tweet_data["tweet_id"]).execute()
-        
-        # If the tweet exists, return the existing record
-        if len(existing_tweet.data) > 0:
-            logger.info(f"Tweet {tweet_data['tweet_id']} already exists, skipping insertion")
-            return existing_tweet.data[0]
-        
-        # Tweet doesn't exist, proceed with insertion
-        data = {
-            "tweet_id": tweet_data["tweet_id"],
-            "analysis_id": analysis_id,
-            "type": tweet_data["type"],
-            "username": tweet_data["username"],
-            "text": tweet_data["text"],
-            "created_at": tweet_data["created_at"].isoformat() if isinstance(tweet_data["created_at"], datetime) else tweet_data["created_at"],
-            "sentiment": tweet_data["sentiment"],
-            "sentiment_score": tweet_data["score"]
-        }
-        
-        response = supabase.table(TWEETS_TABLE).insert(data).execute()
-        
-        if len(response.data) > 0:
-            return response.data[0]
-        else:
-            logger.error(f"Failed to create tweet record for tweet {tweet_data['id']}")
-            raise Exception(f"Failed to create tweet record for tweet {tweet_data['id']}")
+        rows = [_tweet_row(tweet_data, analysis_id) for tweet_data in tweets_data]
+
+        if len(rows) > COPY_THRESHOLD_ROWS:
+            try:
+                pool = get_pg_pool()
+                if pool is not None:
+                    created = _copy_tweet_rows(pool, rows)
+                    logger.info("Copied %s new tweets out of %s for analysis %s", created, len(rows), analysis_id)
+                    return created
+            except (psycopg2.Error, PoolError) as e:
+                # The COPY transaction was rolled back, so the REST upserts start from a clean slate
+                logger.warning("COPY of tweets failed, falling back to REST upserts: %s", e)
+
+        created = 0
+        for chunk in _chunked(rows, BULK_WRITE_BATCH_SIZE):
+            # returning="minimal" keeps the rows out of the response, count="exact" still reports how many were inserted
+            response = supabase.table(TWEETS_TABLE)\
+                .upsert(chunk, on_conflict="tweet_id", ignore_duplicates=True, returning="minimal", count="exact")\
+                .execute()
+            created += response.count or 0
+
+        logger.info("Stored %s new tweets out of %s for analysis %s", created, len(rows), analysis_id)
+        return created
     except Exception as e:
-        logger.error(f"Error creating tweet: {e}")
+        logger.error("Error creating tweets: %s", e)
         raise
 
-def create_graph_data(supabase: Client, graph_data: List[Dict]) -> List[Dict[str, Any]]:
+def create_graph_data(supabase: Client, graph_data: List[Dict]) -> None:
     """
     Create graph data records in the database for a given analysis.
+    Rows are inserted in batches of BULK_WRITE_BATCH_SIZE without returning the inserted rows.
 
     Args:
         supabase: Supabase client
         graph_data: List of graph data points, each containing date, positive, neutral, and negative percentages
-
-    Returns:
-        List of created graph data records
     """
     try:
-        # Insert all graph data points in a single batch
-        response = supabase.table(GRAPH_DATA_TABLE).insert(graph_data).execute()
+        for chunk in _chunked(graph_data, BULK_WRITE_BATCH_SIZE):
+            supabase.table(GRAPH_DATA_TABLE).insert(chunk, returning="minimal").execute()
 
     except Exception as e:
-        logger.error(f"Error creating graph data: {e}")
+        logger.error("Error creating graph data: %s", e)
         raise
 
 def get_analysis_report(supabase: Client, username: str) -> List[Dict[str, Any]]:
@@ -158,63 +247,66 @@ def get_analysis_report(supabase: Client, username: str) -> List[Dict[str, Any]]
     """
     try:
         response = supabase.table(ANALYSES_TABLE)\
-            .select("*")\
+            .select(ANALYSIS_REPORT_COLUMNS)\
             .eq("username", username)\
             .order("analysis_timestamp", desc=True)\
             .execute()
             
         return response.data
     except Exception as e:
-        logger.error(f"Error getting analysis report: {e}")
+        logger.error("Error getting analysis report: %s", e)
         raise
 
-def get_monthly_sentiment_distribution(supabase: Client, username: str, group_by: str = Query("monthly", enum=["monthly", "weekly"])):
-    try:
-        # Step 1: Get all analysis_ids for this username
-        analyses_response = supabase.table(ANALYSES_TABLE)\
-            .select("analysis_id")\
-            .eq("username", username)\
-            .execute()
-
-        analysis_ids = [a["analysis_id"] for a in analyses_response.data]
+def _period_label(period: str, group_by: str) -> str:
+    """
+    Formats a period start returned by monthly_sentiment as its label.
 
-        # Step 2: Get tweets for those analysis_ids
-        tweets_response = supabase.table("tweets")\
-            .select("created_at, sentiment")\
-            .in_("analysis_id", analysis_ids)\
-            .execute()
+    Weekly periods come from date_trunc('week'), which starts ISO weeks on Monday,
+    so they are labelled with the ISO year and week number (e.g. 2024-12-30 -> "2025-W01").
 
-        tweets = tweets_response.data
+    Args:
+        period: ISO timestamp of the period start
+        group_by: "monthly" or "weekly"
 
+    Returns:
+        "YYYY-MM" for months, "YYYY-Www" for ISO weeks
+    """
+    period_format = "%Y-%m" if group_by == "monthly" else "%G-W%V"
+    return datetime.fromisoformat(period).strftime(period_format)
 
-        # Step 3: Grouping key
-        def get_group_key(created_at):
-            dt = parser.parse(created_at)
-            return dt.strftime("%Y-%m") if group_by == "monthly" else dt.strftime("%Y-W%U")
+def get_monthly_sentiment_distribution(supabase: Client, username: str, group_by: str = Query("monthly", enum=["monthly", "weekly"])):
+    cache_key = ("distribution", username, group_by)
+    cached = _get_cached_aggregate(cache_key)
+    if cached is not None:
+        return cached
 
-        # Step 4: Aggregate sentiment counts
-        grouped = defaultdict(lambda: {"positive": 0, "neutral": 0, "negative": 0, "total": 0})
+    try:
+        # Step 1: Count sentiments per period in Postgres (see db/functions.sql)
+        rows = supabase.rpc("monthly_sentiment", {"username": username, "group_by": group_by}).execute().data
 
-        for tweet in tweets:
-            key = get_group_key(tweet["created_at"])
-            sentiment = tweet.get("sentiment")
-            if sentiment in grouped[key]:
-                grouped[key][sentiment] += 1
-                grouped[key]["total"] += 1
+        # Step 2: Sum the aggregated counts per period label and sentiment in one pass
+        grouped = defaultdict(Counter)
+        for row in rows:
+            sentiment = row.get("sentiment")
+            if sentiment in VALID_SENTIMENTS:
+                grouped[_period_label(row["period"], group_by)][sentiment] += row["tweet_count"]
 
-        # Step 5: Calculate sentiment ratios
+        # Step 3: Calculate sentiment ratios
         result = []
-        for key, counts in sorted(grouped.items()):
-            total = counts["total"]
+        for key, period_counts in grouped.items():
+            total = sum(period_counts.values())
             result.append({
                 "time_period": key,
                 "total_tweets": total,
-                "positive_ratio": round(counts["positive"] / total, 3),
-                "neutral_ratio": round(counts["neutral"] / total, 3),
-                "negative_ratio": round(counts["negative"] / total, 3),
+                "positive_ratio": round(period_counts["positive"] / total, 3),
+                "neutral_ratio": round(period_counts["neutral"] / total, 3),
+                "negative_ratio": round(period_counts["negative"] / total, 3),
             })
+        result.sort(key=itemgetter("time_period"))
 
-        return {"data": result}
+        distribution = {"data": result}
+        _set_cached_aggregate(cache_key, distribution)
+        return distribution
 
     except Exception as e:
         return {"error": str(e)}
@@ -230,34 +322,23 @@ def get_overall_sentiment_summary_for_username(supabase: Client, username: str)
     Returns:
         Dictionary containing overall sentiment percentages (positive, neutral, negative).
     """
-    try:
-        # Step 1: Get all analysis_ids for this username
-        analyses_response = supabase.table(ANALYSES_TABLE)\
-            .select("analysis_id")\
-            .eq("username", username)\
-            .execute()
-        analysis_ids = [a["analysis_id"] for a in analyses_response.data]
+    cache_key = ("summary", username)
+    cached = _get_cached_aggregate(cache_key)
+    if cached is not None:
+        return cached
 
-        # Step 2: Fetch sentiments for all tweets under these analysis_ids
-        tweets_response = supabase.table(TWEETS_TABLE)\
-            .select("sentiment")\
-            .in_("analysis_id", analysis_ids)\
-            .execute()
-        tweets_sentiment_labels = [tweet["sentiment"] for tweet in tweets_response.data]
-
-
-        # Step 3: Calculate summary from sentiment labels (reuse calculate_summary logic)
-        sentiment_counts = {"positive": 0, "neutral": 0, "negative": 0}
-        for label in tweets_sentiment_labels:
-            if label in sentiment_counts:
-                sentiment_counts[label] += 1
-        total_tweets = len(tweets_sentiment_labels)
+    try:
+        # Step 1: Count sentiments across all analyses in Postgres (see db/functions.sql)
+        counts = supabase.rpc("overall_sentiment", {"username": username}).execute().data[0]
 
-        summary = {k: round(v / total_tweets, 2) if total_tweets > 0 else 0.0 for k, v in sentiment_counts.items()}
+        # Step 2: Calculate summary from sentiment counts
+        total_tweets = counts["total"]
+        summary = {k: round(counts[k] / total_tweets, 2) if total_tweets > 0 else 0.0 for k in ("positive", "neutral", "negative")}
+        _set_cached_aggregate(cache_key, summary)
         return summary
 
     except Exception as e:
-        logger.error(f"Error getting overall sentiment summary for username: {e}")
+        logger.error("Error getting overall sentiment summary for username: %s", e)
         return {"positive": 0.0, "neutral": 0.0, "negative": 0.0}
 
 def fetch_tweets_by_analysis_id(supabase, analysis_id, sentiment =None, tweet_type=None, limit=None):
@@ -276,7 +357,7 @@ def fetch_tweets_by_analysis_id(supabase, analysis_id, sentiment =None, tweet_ty
     Returns:
     - List of tweets formatted according to TweetSentiment model
     """
-    query = supabase.table(TWEETS_TABLE).select("tweet_id, type, text, username, created_at, sentiment, sentiment_score")
+    query = supabase.table(TWEETS_TABLE).select(TWEET_RESPONSE_COLUMNS)
     
     # Apply filters
     query = query.eq("analysis_id", analysis_id)
@@ -295,50 +376,47 @@ def fetch_tweets_by_analysis_id(supabase, analysis_id, sentiment =None, tweet_ty
     response = query.execute()
     return transform_tweets_for_response(response.data)
 
-def transform_tweets_for_response(tweets_data: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
-    """Transforms tweet data from Supabase response to the format expected by TweetSentiment model."""
-    # Transform data to match TweetSentiment model
-
-    transformed_tweets: List[Dict[str, Any]] = []
-    for tweet in tweets_data:
-        transformed_tweet = {
-            "id": str(tweet["tweet_id"]),  # Convert to string as per model
-            "type": tweet["type"],
-            "text": tweet["text"],
-            "username": tweet["username"],
-            "created_at": tweet["created_at"],
-            "sentiment": tweet["sentiment"],
-            "score": float(tweet["sentiment_score"])  # Ensure it's a float
-        }
-        transformed_tweets.append(transformed_tweet)
-     
-    return transformed_tweets
-
-def fetch_all_tweets_for_username(supabase: Client, username: str) -> List[Dict[str, Any]]:
+def get_analysis_reports_with_tweets(supabase: Client, username: str) -> List[Dict[str, Any]]:
     """
-    Fetch all tweets for a given username across all their analyses.
+    Get all analyses for a username together with their tweets in a single query.
+    The tweets are embedded through the tweets.analysis_id foreign key.
 
     Args:
         supabase: Supabase client
-        username: Twitter username
+        username: Twitter username to get analyses for
 
     Returns:
-        List of all tweet records for the username.
+        List of analysis records, newest first, each with a "tweets" list formatted for TweetSentiment
     """
     try:
-        # Step 1: Get all analysis_ids for this username
-        analysis_response = supabase.table(ANALYSES_TABLE)\
-            .select("analysis_id").eq("username", username).execute()
-        analysis_ids = [item["analysis_id"] for item in analysis_response.data]
-
-        # Step 2: Fetch all tweets for these analysis_ids
-        tweets_response = supabase.table(TWEETS_TABLE)\
-            .select("*").in_("analysis_id", analysis_ids).execute()
-        return transform_tweets_for_response(tweets_response.data)
+        response = supabase.table(ANALYSES_TABLE)\
+            .select(f"{ANALYSIS_REPORT_COLUMNS}, {TWEETS_TABLE}({TWEET_RESPONSE_COLUMNS})")\
+            .eq("username", username)\
+            .order("analysis_timestamp", desc=True)\
+            .execute()
 
+        for analysis in response.data:
+            analysis[TWEETS_TABLE] = transform_tweets_for_response(analysis.get(TWEETS_TABLE) or [])
+        return response.data
     except Exception as e:
-        logger.error(f"Error fetching all tweets for username: {e}")
-        return []
+        logger.error("Error getting analysis reports with tweets: %s", e)
+        raise
+
+def transform_tweets_for_response(tweets_data: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Transforms tweet data from Supabase response to the format expected by TweetSentiment model."""
+    # sentiment_score is a DOUBLE PRECISION column, so it already arrives as a float
+    return [
+        {
+            "id": str(tweet["tweet_id"]),  # Convert to string as per model
+            "type": tweet["type"],
+            "text": tweet["text"],
+            "username": tweet["username"],
+            "created_at": tweet["created_at"],
+            "sentiment": tweet["sentiment"],
+            "score": tweet["sentiment_score"]
+        }
+        for tweet in tweets_data
+    ]
 
 def fetch_top_tweets_for_username(supabase: Client, username: str, sentiment: str,tweet_type: str, limit: int) -> List[Dict[str, Any]]:
     """
@@ -355,18 +433,10 @@ def fetch_top_tweets_for_username(supabase: Client, username: str, sentiment: st
         List of top tweet records.
     """
     try:
-        # Step 1: Get all analysis_ids for this username
-        analyses_response = supabase.table(ANALYSES_TABLE)\
-            .select("analysis_id")\
-            .eq("username", username)\
-            .execute()
-        analysis_ids = [a["analysis_id"] for a in analyses_response.data]
-
-        print(f"[DEBUG] Analysis_ids: {analysis_ids}")
-        # Step 2: Fetch tweets for those analysis_ids with specified sentiment and type, order by score
+        # Fetch the user's tweets with specified sentiment and type, joined to analyses in a single query, order by score
         tweets_response = supabase.table(TWEETS_TABLE)\
-            .select("tweet_id, type, text, username, created_at, sentiment, sentiment_score")\
-            .in_("analysis_id", analysis_ids)\
+            .select(f"{TWEET_RESPONSE_COLUMNS}, analyses!inner(username)")\
+            .eq("analyses.username", username)\
             .eq("sentiment", sentiment)\
             .eq("type", tweet_type)\
             .order("sentiment_score", desc=True)\
@@ -376,7 +446,7 @@ def fetch_top_tweets_for_username(supabase: Client, username: str, sentiment: st
         return transform_tweets_for_response(tweets_response.data)
 
     except Exception as e:
-        logger.error(f"Error fetching top tweets for username: {e}")
+        logger.error("Error fetching top tweets for username: %s", e)
         return []
 
 # def fetch_latest_tweets_by_username(supabase: Client, username: str) -> Optional[Dict[str, Any]]:
@@ -426,53 +496,67 @@ def fetch_top_tweets_for_username(supabase: Client, username: str, sentiment: st
 
 def fetch_latest_tweets_by_username(supabase: Client, username: str) -> Optional[Dict[str, Any]]:
     """
-    Fetch the most recent analysis and its tweets for a given username.
+    Fetch today's most recent finished /user-tweets analysis for a given username.
+    Analyses still in flight or that failed have no tweet_count, and /analyze runs
+    store {"count": ...} instead of {"max_tweets": ...} as query_parameters, so neither is matched.
     
     Args:
         supabase: Supabase client
         username: Twitter username
         
     Returns:
-        Dictionary containing analysis data and associated tweets, or None if no data exists
+        The analysis record (analysis_id) if the username was analysed today, or None
     """
     try:
-        # Get today's date in the format YYYY-MM-DD
-        today = datetime.now().strftime('%Y-%m-%d')
+        # analysis_timestamp is a full timestamp, so match today with a range (served by idx_analyses_username_ts)
+        today = datetime.now().date()
+        tomorrow = today + timedelta(days=1)
         
-        # Get the most recent analysis for the username with current timestamp
+        # Get the most recent finished analysis for the username from today
         analysis = supabase.table(ANALYSES_TABLE)\
-            .select("*")\
+            .select("analysis_id")\
             .eq("username", username)\
-            .eq("analysis_timestamp", today)\
+            .gte("analysis_timestamp", today.isoformat())\
+            .lt("analysis_timestamp", tomorrow.isoformat())\
+            .not_.is_("tweet_count", "null")\
+            .not_.is_("query_parameters->>max_tweets", "null")\
+            .order("analysis_timestamp", desc=True)\
             .limit(1)\
             .execute()
             
-        # If no analysis for today, fall back to the most recent one
         if not analysis.data:
-            return False # I don't have latest data
+            return None # I don't have latest data
+        return analysis.data[0]
     except Exception as e:
-        logger.error(f"Error checking tweet existence: {e}")
-        return False
+        logger.error("Error fetching latest analysis for username: %s", e)
+        return None
     
 
-def check_tweet_exists(supabase: Client, tweet_id: str) -> bool:
+def check_tweets_exist(supabase: Client, tweet_ids: List[str]) -> Set[str]:
     """
-    Check if a tweet already exists in the database.
+    Check which of the given tweets already exist in the database.
+    IDs are sent EXISTENCE_CHECK_BATCH_SIZE at a time, so most calls need a single query.
     
     Args:
         supabase: Supabase client
-        tweet_id: ID of the tweet to check
+        tweet_ids: IDs of the tweets to check
         
     Returns:
-        bool: True if tweet exists, False otherwise
+        Set[str]: IDs of the tweets that are already stored
     """
+    if not tweet_ids:
+        return set()
+
     try:
-        result = supabase.table(TWEETS_TABLE)\
-            .select("tweet_id")\
-            .eq("tweet_id", tweet_id)\
-            .execute()
-        
-        return len(result.data) > 0
+        existing = set()
+        for chunk in _chunked(tweet_ids, EXISTENCE_CHECK_BATCH_SIZE):
+            result = supabase.table(TWEETS_TABLE)\
+                .select("tweet_id")\
+                .in_("tweet_id", chunk)\
+                .execute()
+            existing.update(str(tweet["tweet_id"]) for tweet in result.data)
+
+        return existing
     except Exception as e:
-        logger.error(f"Error checking tweet existence: {e}")
-        return False
\ No newline at end of file
+        logger.error("Error checking tweet existence: %s", e)
+        return set()
\ No newline at end of file
@@ -1,11 +1,13 @@
 # backend/db/database.py
 import os
+import threading
+import httpx
+from psycopg2.pool import ThreadedConnectionPool
+from postgrest.utils import SyncClient
 from supabase import create_client, Client
 from core.config import settings
 import logging
 
-# Set up logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 # Get Supabase credentials from environment variables or settings
@@ -18,13 +20,39 @@ if not SUPABASE_URL:
 if not SUPABASE_API_KEY:
     raise ValueError("SUPABASE_API_KEY is not set. Please check your .env file or environment variables.")
 
+# Connection pool shared by every request to Supabase's REST API
+HTTP_LIMITS = httpx.Limits(
+    max_connections=settings.SUPABASE_MAX_CONNECTIONS,
+    max_keepalive_connections=settings.SUPABASE_MAX_CONNECTIONS,
+    keepalive_expiry=settings.SUPABASE_KEEPALIVE_EXPIRY,
+)
+
+def _use_pooled_session(client: Client) -> None:
+    """
+    Replaces the PostgREST HTTP session with one using HTTP_LIMITS.
+    supabase-py 2.13 doesn't accept a custom httpx client, so the session is swapped after creation.
+    HTTP/1.1 is used so concurrent requests get their own pooled connections (HTTP/2 would multiplex them over one).
+    """
+    postgrest = client.postgrest
+    default_session = postgrest.session
+    postgrest.session = SyncClient(
+        base_url=default_session.base_url,
+        headers=default_session.headers,
+        timeout=default_session.timeout,
+        limits=HTTP_LIMITS,
+        follow_redirects=True,
+        http2=False,
+    )
+    default_session.close()
+
 # Create Supabase client
 try:
-    logger.info(f"Connecting to Supabase at {SUPABASE_URL}")
+    logger.info("Connecting to Supabase at %s", SUPABASE_URL)
     supabase: Client = create_client(SUPABASE_URL, SUPABASE_API_KEY)
+    _use_pooled_session(supabase)
     logger.info("Successfully connected to Supabase")
 except Exception as e:
-    logger.error(f"Failed to connect to Supabase: {e}")
+    logger.error("Failed to connect to Supabase: %s", e)
     raise
 
 def get_supabase_client():
@@ -32,4 +60,22 @@ def get_supabase_client():
     Returns the Supabase client for database operations.
     Used as a dependency in FastAPI routes.
     """
-    return supabase
\ No newline at end of file
+    return supabase
+
+# Direct Postgres connections, only used for bulk loads that are too large for the REST API
+_pg_pool: ThreadedConnectionPool = None
+_pg_pool_lock = threading.Lock()
+
+def get_pg_pool() -> ThreadedConnectionPool:
+    """
+    Returns a pool of direct Postgres connections to DATABASE_URL, created on first use.
+    Returns None when DATABASE_URL is not configured.
+    """
+    global _pg_pool
+    if not settings.DATABASE_URL:
+        return None
+    with _pg_pool_lock:
+        if _pg_pool is None:
+            logger.info("Creating Postgres connection pool")
+            _pg_pool = ThreadedConnectionPool(1, settings.DATABASE_POOL_MAX_CONNECTIONS, settings.DATABASE_URL)
+    return _pg_pool
\ No newline at end of file
@@ -0,0 +1,34 @@
+-- Aggregation functions exposed to the API through Supabase RPC (supabase.rpc(...))
+-- Run once in the Supabase SQL editor; CREATE OR REPLACE makes it safe to re-run.
+
+-- Sentiment counts per month/week for a username, aggregated inside Postgres
+-- Weeks are ISO weeks starting on Monday, as date_trunc('week') does
+CREATE OR REPLACE FUNCTION monthly_sentiment(username TEXT, group_by TEXT DEFAULT 'monthly')
+RETURNS TABLE (period TIMESTAMPTZ, sentiment VARCHAR, tweet_count BIGINT)
+LANGUAGE sql STABLE
+AS $$
+    SELECT
+        date_trunc(CASE WHEN monthly_sentiment.group_by = 'weekly' THEN 'week' ELSE 'month' END, t.created_at) AS period,
+        t.sentiment,
+        COUNT(*) AS tweet_count
+    FROM analyses AS a
+    JOIN tweets AS t ON a.analysis_id = t.analysis_id
+    WHERE a.username = monthly_sentiment.username
+    GROUP BY 1, 2
+    ORDER BY 1;
+$$;
+
+-- Overall sentiment counts for a username across all of its analyses
+CREATE OR REPLACE FUNCTION overall_sentiment(username TEXT)
+RETURNS TABLE (positive BIGINT, neutral BIGINT, negative BIGINT, total BIGINT)
+LANGUAGE sql STABLE
+AS $$
+    SELECT
+        COUNT(*) FILTER (WHERE t.sentiment = 'positive') AS positive,
+        COUNT(*) FILTER (WHERE t.sentiment = 'neutral')  AS neutral,
+        COUNT(*) FILTER (WHERE t.sentiment = 'negative') AS negative,
+        COUNT(*) AS total
+    FROM analyses AS a
+    JOIN tweets AS t ON a.analysis_id = t.analysis_id
+    WHERE a.username = overall_sentiment.username;
+$$;
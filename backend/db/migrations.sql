@@ -0,0 +1,13 @@
+-- Changes to apply to databases created from an older db/supa.sql.
+-- Fresh setups get these directly from db/supa.sql.
+
+-- Store model scores as floats so they are returned as floats without casting
+ALTER TABLE tweets ALTER COLUMN sentiment_score TYPE DOUBLE PRECISION;
+
+-- Indexes for the username / top-tweets lookups in db/crud.py.
+-- CONCURRENTLY can't run inside a transaction block: run these statements one at a time.
+-- tweets.tweet_id is already unique through its PRIMARY KEY.
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_analyses_username_ts ON analyses (username, analysis_timestamp DESC);
+DROP INDEX CONCURRENTLY IF EXISTS idx_analyses_username; -- Covered by idx_analyses_username_ts
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_tweets_analysis_id ON tweets (analysis_id);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_tweets_top ON tweets (analysis_id, sentiment, type, sentiment_score DESC);
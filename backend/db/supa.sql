@@ -19,7 +19,7 @@ CREATE TABLE tweets (
     text TEXT,                      -- Full text of the tweet
     created_at TIMESTAMP WITH TIME ZONE, -- Tweet creation timestamp
     sentiment VARCHAR(50),          -- Sentiment label: 'positive', 'neutral', 'negative'
-    sentiment_score NUMERIC         -- Sentiment score (e.g., from the model)
+    sentiment_score DOUBLE PRECISION -- Sentiment score (e.g., from the model)
 );
 
 -- Table to store graph data for sentiment analysis over time
@@ -60,9 +60,10 @@ CREATE INDEX idx_sentiment_timeseries_period ON sentiment_timeseries(period_type
 CREATE INDEX idx_sentiment_timeseries_analysis ON sentiment_timeseries(analysis_id);
 
 -- Indexes for performance (optional, but recommended for larger datasets)
-CREATE INDEX idx_analyses_username ON analyses (username);
+CREATE INDEX idx_analyses_username_ts ON analyses (username, analysis_timestamp DESC);
 CREATE INDEX idx_tweets_analysis_id ON tweets (analysis_id);
 CREATE INDEX idx_tweets_sentiment ON tweets (sentiment);
+CREATE INDEX idx_tweets_top ON tweets (analysis_id, sentiment, type, sentiment_score DESC); -- Top tweets per sentiment/type without sorting
 
 -- Create indexes for performance
 CREATE INDEX idx_graph_data_analysis_id ON graph_data (analysis_id);
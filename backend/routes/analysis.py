@@ -1,5 +1,7 @@
 # backend/routes/analysis.py
+import asyncio
 from fastapi import APIRouter, HTTPException, Depends
+from fastapi.concurrency import run_in_threadpool
 from schemas.analysis_request import AnalysisRequest
 from schemas.analysis_response import AnalysisResponse, TweetSentiment, SentimentSummary
 from service import twitter_service, sentiment_service
@@ -7,6 +9,9 @@ from typing import List, Dict, Any
 from db.database import get_supabase_client
 from db import crud
 from supabase import Client
+import logging
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
@@ -29,12 +34,13 @@ async def analyze_tweets(request_data: AnalysisRequest, supabase: Client = Depen
         tweet['type'] = 'Post'  # Mark as post
         all_tweets_data.append(tweet)
 
-        """ DUE To Limitation of less replies on Latest Tweets """
-        # replies = await twitter_service.get_replies_for_tweet(tweet['id'])
-        # for reply in replies:
-        #     all_texts.append(reply['text'])
-        #     reply['type'] = 'reply'  # Mark as reply
-        #     all_tweets_data.append(reply)
+    """ DUE To Limitation of less replies on Latest Tweets """
+    # replies_per_tweet = await twitter_service.get_replies_for_tweets([tweet['id'] for tweet in tweets])
+    # for replies in replies_per_tweet:
+    #     for reply in replies:
+    #         all_texts.append(reply['text'])
+    #         reply['type'] = 'reply'  # Mark as reply
+    #         all_tweets_data.append(reply)
 
     if not all_texts:
         raise HTTPException(status_code=404, detail="No tweets or replies found.")
@@ -52,22 +58,22 @@ async def get_sentiment_reports_for_user(username: str, supabase: Client = Depen
     Retrieves sentiment analysis reports for a specific username.
     Returns a list of AnalysisResponse objects.
     """
-    db_analyses = crud.get_analysis_report(supabase, username=username)
+    # Fetch the analyses, top positive/negative tweets and overall summary concurrently.
+    # supabase-py is sync, so each independent query runs in the threadpool instead of blocking the event loop.
+    db_analyses, top_positive_db, top_negative_db, overall_summary_db = await asyncio.gather(
+        run_in_threadpool(crud.get_analysis_report, supabase, username=username),
+        run_in_threadpool(crud.fetch_top_tweets_for_username, supabase, username=username, sentiment='positive', tweet_type='Reply', limit=7),
+        run_in_threadpool(crud.fetch_top_tweets_for_username, supabase, username=username, sentiment='negative', tweet_type='Reply', limit=7),
+        run_in_threadpool(crud.get_overall_sentiment_summary_for_username, supabase, username=username),
+    )
     if not db_analyses:
         raise HTTPException(status_code=404, detail=f"No analysis reports found for user: {username}")
-    print(f"[DEBUG] Found {len(db_analyses)} reporting { username }")
-    
-    # Fetch top positive and negative tweets across all analyses for the user
-    top_positive_db = crud.fetch_top_tweets_for_username(supabase, username=username, sentiment='positive', tweet_type='Reply', limit=7)
-    top_negative_db = crud.fetch_top_tweets_for_username(supabase, username=username, sentiment='negative', tweet_type='Reply', limit=7)
+    logger.debug("Found %s reports for %s", len(db_analyses), username)
 
     # Convert Supabase records to Response models
     top_positive_response = [TweetSentiment(**tweet) for tweet in top_positive_db]
     top_negative_response = [TweetSentiment(**tweet) for tweet in top_negative_db]
-    print(f"[DEBUG] Found top_positive_response: {len(top_positive_response)}, top_negative_response: {len(top_negative_response)}")
-
-    # Fetch overall sentiment summary for the user
-    overall_summary_db = crud.get_overall_sentiment_summary_for_username(supabase, username=username)
+    logger.debug("Found %s top positive and %s top negative replies", len(top_positive_response), len(top_negative_response))
 
     # Handle cases where summary data might be None or missing keys
     analysis_summary = SentimentSummary(
@@ -76,10 +82,6 @@ async def get_sentiment_reports_for_user(username: str, supabase: Client = Depen
             negative=float(overall_summary_db["negative"])
         )
 
-    # # Fetch all tweets for all analyses for this user to show in report - might be heavy if many tweets
-    # all_tweets_db = crud.fetch_all_tweets_for_username(supabase, username=username) # New function in crud.py
-    # all_tweets_response = [TweetSentiment(**tweet) for tweet in all_tweets_db]
-
     analysis_responses: List[AnalysisResponse] = []
     analysis_response_item = AnalysisResponse(
         summary=analysis_summary,
@@ -1,5 +1,7 @@
 # backend/routes/analysis.py
+import heapq
 from fastapi import APIRouter, HTTPException, Depends
+from fastapi.concurrency import run_in_threadpool
 from schemas.analysis_request import AnalysisRequest
 from schemas.analysis_response import AnalysisResponse, TweetSentiment, SentimentSummary
 from service import twitter_service, sentiment_service
@@ -7,6 +9,9 @@ from typing import List, Dict, Any
 from db.database import get_supabase_client
 from db import crud
 from supabase import Client
+import logging
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
@@ -29,12 +34,13 @@ async def analyze_tweets(request_data: AnalysisRequest, supabase: Client = Depen
         tweet['type'] = 'Post'  # Mark as post
         all_tweets_data.append(tweet)
 
-        """ DUE To Limitation of less replies on Latest Tweets """
-        # replies = await twitter_service.get_replies_for_tweet(tweet['id'])
-        # for reply in replies:
-        #     all_texts.append(reply['text'])
-        #     reply['type'] = 'reply'  # Mark as reply
-        #     all_tweets_data.append(reply)
+    """ DUE To Limitation of less replies on Latest Tweets """
+    # replies_per_tweet = await twitter_service.get_replies_for_tweets([tweet['id'] for tweet in tweets])
+    # for replies in replies_per_tweet:
+    #     for reply in replies:
+    #         all_texts.append(reply['text'])
+    #         reply['type'] = 'reply'  # Mark as reply
+    #         all_tweets_data.append(reply)
 
     if not all_texts:
         raise HTTPException(status_code=404, detail="No tweets or replies found.")
@@ -52,21 +58,27 @@ async def get_sentiment_reports_for_user(username: str, supabase: Client = Depen
     Retrieves sentiment analysis reports for a specific username.
     Returns a list of AnalysisResponse objects.
     """
-    db_analyses = crud.get_analysis_report(supabase, username=username)
+    # One query returns every analysis with its tweets embedded
+    db_analyses = await run_in_threadpool(crud.get_analysis_reports_with_tweets, supabase, username=username)
     if not db_analyses:
         raise HTTPException(status_code=404, detail=f"No analysis reports found for user: {username}")
-    print(f"[DEBUG] Found {len(db_analyses)} reporting { username }")
+    logger.debug("Found %s reports for %s", len(db_analyses), username)
+
+    def top_tweets(tweets: List[Dict[str, Any]], sentiment: str, tweet_type: str, limit: int) -> List[Dict[str, Any]]:
+        matching = (tweet for tweet in tweets if tweet["sentiment"] == sentiment and tweet["type"] == tweet_type)
+        return heapq.nlargest(limit, matching, key=lambda tweet: tweet["score"] or 0.0)
+
     analysis_responses: List[AnalysisResponse] = []
     for db_analysis in db_analyses:
-        top_positive_db = crud.fetch_tweets_by_analysis_id(supabase, analysis_id= db_analysis["analysis_id"], sentiment='positive', tweet_type= 'post', limit= 5)
-        top_negative_db = crud.fetch_tweets_by_analysis_id(supabase, analysis_id= db_analysis["analysis_id"], sentiment='negative', tweet_type='post', limit= 5)
+        all_tweets = db_analysis["tweets"]
+        top_positive_db = top_tweets(all_tweets, sentiment='positive', tweet_type='post', limit=5)
+        top_negative_db = top_tweets(all_tweets, sentiment='negative', tweet_type='post', limit=5)
 
         # Convert Supabase records to Response models
         top_positive_response = [TweetSentiment(**tweet) for tweet in top_positive_db]
         top_negative_response = [TweetSentiment(**tweet) for tweet in top_negative_db]
-        print(f"[DEBUG] Found top_positive_response: {len(top_positive_response)}, top_negative_response: {top_negative_response}")
+        logger.debug("Found %s top positive and %s top negative posts for analysis %s", len(top_positive_response), len(top_negative_response), db_analysis["analysis_id"])
 
-        print(f"[DEBUG] check db_analysis:{ db_analysis }")
         # Working Great ===> Later ==> FIX This get None Type Error Or 0.0 || Need to update things on db to get useful info 
         if db_analysis["positive_sentiment_percentage"] is None:
             analysis_summary = SentimentSummary( positive= 0.0, neutral= 0.0, negative= 0.0 )
@@ -77,9 +89,6 @@ async def get_sentiment_reports_for_user(username: str, supabase: Client = Depen
                 negative=float(db_analysis["negative_sentiment_percentage"])
             )
 
-        # Get all tweets for this analysis
-        all_tweets = crud.fetch_tweets_by_analysis_id(supabase, db_analysis["analysis_id"])
-        
         analysis_response_item = AnalysisResponse(
             summary=analysis_summary,
             tweets=[TweetSentiment(**tweet) for tweet in all_tweets],
@@ -11,10 +11,8 @@ from supabase import Client
 from db.crud import get_monthly_sentiment_distribution
 
 
-# Set up basic logging
-print("Loading user_tweets.py router module")
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
+logger.debug("Loading user_tweets.py router module")
 
 router = APIRouter()
 
@@ -25,7 +23,7 @@ async def get_user_tweets(request_data: UserTweetsRequest, supabase: Client =Dep
     Returns structured data, generates a CSV file, and stores data in Supabase.
     """
 
-    logger.info(f"Fetching tweets for user: {request_data.username}, max_tweets: {request_data.max_tweets}")
+    logger.info("Fetching tweets for user: %s, max_tweets: %s", request_data.username, request_data.max_tweets)
 
     response = await twitter_service.fetch_user_tweets_and_replies(
         request_data.username,
@@ -39,12 +37,13 @@ async def get_user_tweets(request_data: UserTweetsRequest, supabase: Client =Dep
     return response
 
 @router.get("/user-tweets/weekly_or_monthly_analysis/{username}")
-async def weekly_or_monthly_analysis(username: str, group_by: str = Query("monthly", enum=["monthly", "weekly"]), supabase: Client = Depends(get_supabase_client)):
+def weekly_or_monthly_analysis(username: str, group_by: str = Query("monthly", enum=["monthly", "weekly"]), supabase: Client = Depends(get_supabase_client)):
     """
     Returns weekly or monthly analysis for a specific user.
+    Plain def on purpose: the Supabase client is sync, so FastAPI runs this in its threadpool.
     """
     try:
         return get_monthly_sentiment_distribution(supabase, username, group_by)
     except Exception as e:
-        logger.error(f"Error getting weekly or monthly analysis: {e}")
+        logger.error("Error getting weekly or monthly analysis: %s", e)
         raise HTTPException(status_code=500, detail=f"Failed to get weekly or monthly analysis: {e}")
\ No newline at end of file
@@ -3,74 +3,54 @@ from fastapi import APIRouter, HTTPException, BackgroundTasks, Depends
 from fastapi.responses import FileResponse
 from schemas.user_tweets_request import UserTweetsRequest
 from schemas.user_tweets_response import UserTweetsResponse, TweetData
-from service import twitter_service
-from service.sentiment_service import analyze_sentiment
-from utils.helpers import map_sentiment_label
+from service import twitter_service_old
 from db import crud
+from utils.helpers import parse_tweet_timestamp
+from datetime import datetime, timezone
 import os
 import logging
 from typing import List
 from db.database import get_supabase_client
 
 
-# Set up basic logging
-print("Loading user_tweets.py router module")
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
+logger.debug("Loading user_tweets.py router module")
 
 router = APIRouter()
 
 @router.post("/user-tweets", response_model=UserTweetsResponse)
-async def get_user_tweets(request_data: UserTweetsRequest, supabase=Depends(get_supabase_client)):
+async def get_user_tweets(request_data: UserTweetsRequest, background_tasks: BackgroundTasks, supabase=Depends(get_supabase_client)):
     """
     Fetches tweets and replies for a specific Twitter user.
-    Returns structured data, generates a CSV file, and stores data in Supabase.
+    Returns structured data, stores data in Supabase, and writes a CSV file in the background.
     """
-    print(f"[DEBUG] Starting get_user_tweets with username: {request_data.username}, max_tweets: {request_data.max_tweets}")
-    logger.info(f"Fetching tweets for user: {request_data.username}, max_tweets: {request_data.max_tweets}")
+    logger.info("Fetching tweets for user: %s, max_tweets: %s", request_data.username, request_data.max_tweets)
     
-    # Fetch tweets and generate CSV
-    file_path = await twitter_service.fetch_user_tweets_and_replies(
+    # Fetch tweets and replies as in-memory rows
+    raw_tweets = await twitter_service_old.fetch_user_tweets_and_replies(
         request_data.username, 
         request_data.max_tweets,
         supabase
     )
     
-    if not file_path:
-        print(f"[DEBUG] Failed to fetch tweets for user {request_data.username}")
+    if raw_tweets is None:
+        logger.debug("Failed to fetch tweets for user %s", request_data.username)
         raise HTTPException(status_code=404, detail=f"Could not fetch tweets for user: {request_data.username}")
-    
-    # Read the CSV to create response data
-    tweets_data = []
-    raw_tweets = []
-    try:
-        import csv
-        with open(file_path, 'r', encoding='utf-8') as file:
-            reader = csv.reader(file)
-            next(reader)  # Skip header row
-            for row in reader:
-                if len(row) >= 5:  # Ensure we have all expected columns
-                    tweet_data = TweetData(
-                        tweet_id=row[0],
-                        username=row[1],
-                        text=row[2],
-                        created_at=row[3],
-                        type=row[4]
-                    )
-                    tweets_data.append(tweet_data)
-                    
-                    # Add raw tweet data for sentiment analysis and database storage
-                    raw_tweets.append({
-                        'id': row[0],
-                        'username': row[1],
-                        'text': row[2],
-                        'created_at': row[3],
-                        'type': row[4]
-                    })
-    except Exception as e:
-        print(f"[DEBUG] Error reading CSV file: {e}")
-        logger.error(f"Error reading CSV file: {e}")
-        raise HTTPException(status_code=500, detail="Error processing tweet data")
+
+    tweets_data = [
+        TweetData(
+            tweet_id=str(tweet['id']),
+            username=tweet['username'],
+            text=tweet['text'],
+            created_at=tweet['created_at'],
+            type=tweet['type']
+        )
+        for tweet in raw_tweets
+    ]
+
+    # The CSV export is written after the response is sent
+    file_path = f'{request_data.username}_tweets_and_replies_temp.csv'
+    background_tasks.add_task(twitter_service_old.write_tweets_csv, file_path, raw_tweets)
     
     # Store tweets in Supabase
     try:
@@ -81,35 +61,27 @@ async def get_user_tweets(request_data: UserTweetsRequest, supabase=Depends(get_
             query_parameters={"max_tweets": request_data.max_tweets}
         )
         analysis_id = analysis["analysis_id"]
-        logger.info(f"Created analysis record with ID: {analysis_id}")
-        
-        # Analyze sentiment for all tweets
-        all_texts = [tweet['text'] for tweet in raw_tweets]
-        sentiment_results = analyze_sentiment(all_texts)
+        logger.info("Created analysis record with ID: %s", analysis_id)
         
-        # Process and store each tweet
-        for i, tweet in enumerate(raw_tweets):
-            if i < len(sentiment_results):
-                sentiment = sentiment_results[i]
-                sentiment_label = map_sentiment_label(sentiment['label'])
-                score = sentiment['score']
-                
-                # Prepare tweet data for Supabase
-                db_tweet_data = {
-                    "id": tweet['id'],
-                    "type": tweet['type'],
-                    "username": tweet['username'],
-                    "text": tweet['text'],
-                    "created_at": tweet['created_at'],
-                    "sentiment": sentiment_label,
-                    "score": float(score)
-                }
-                
-                # Store tweet in Supabase
-                crud.create_tweet(supabase, db_tweet_data, analysis_id)
+        # Prepare tweet rows for Supabase; the service already computed each row's sentiment
+        db_tweets = [
+            {
+                "tweet_id": tweet['id'],
+                "type": tweet['type'],
+                "username": tweet['username'],
+                "text": tweet['text'],
+                "created_at": tweet['created_at'],
+                "sentiment": tweet['sentiment'],
+                "score": tweet['score']
+            }
+            for tweet in raw_tweets
+        ]
+
+        # Store all tweets in Supabase with bulk upserts, skipping the ones that already exist
+        crud.create_tweets_bulk(supabase, db_tweets, analysis_id)
         
         # Calculate sentiment summary
-        sentiments = [map_sentiment_label(result['label']) for result in sentiment_results]
+        sentiments = [tweet['sentiment'] for tweet in raw_tweets]
         positive_count = sentiments.count("positive")
         neutral_count = sentiments.count("neutral")
         negative_count = sentiments.count("negative")
@@ -125,23 +97,24 @@ async def get_user_tweets(request_data: UserTweetsRequest, supabase=Depends(get_
             # Update analysis with summary
             crud.update_analysis_summary(supabase, analysis_id, summary, len(raw_tweets))
             
-            # Prepare and store graph data
+            # Prepare and store graph data, dated by the newest stored tweet
+            timestamps = [parse_tweet_timestamp(tweet['created_at']) for tweet in db_tweets]
+            latest = max(filter(None, timestamps), default=None) or datetime.now(timezone.utc)
             graph_data = [{
                 "analysis_id": analysis_id,
-                "date": tweet['created_at'].split(' ')[0] if ' ' in tweet['created_at'] else tweet['created_at'],
+                "date": latest.date().isoformat(),
                 "positive": summary["positive"],
                 "neutral": summary["neutral"],
                 "negative": summary["negative"],
                 "username": request_data.username,
-                "created_at": tweet['created_at']
+                "created_at": latest.isoformat()
             }]
             
             crud.create_graph_data(supabase, graph_data)
             
-        logger.info(f"Successfully stored {len(raw_tweets)} tweets in database")
+        logger.info("Successfully stored %s tweets in database", len(raw_tweets))
     except Exception as e:
-        logger.error(f"Error storing tweets in database: {e}")
-        print(f"[DEBUG] Error storing tweets in database: {e}")
+        logger.error("Error storing tweets in database: %s", e)
         # Continue with response even if database storage fails
     
     # Create response
@@ -152,7 +125,7 @@ async def get_user_tweets(request_data: UserTweetsRequest, supabase=Depends(get_
         file_path=file_path
     )
     
-    print(f"[DEBUG] Successfully processed {len(tweets_data)} tweets for user {request_data.username}")
+    logger.debug("Successfully processed %s tweets for user %s", len(tweets_data), request_data.username)
     return response
 
 # @router.get("/user-tweets/download/{username}")
@@ -1,5 +1,6 @@
 # backend/app/schemas/analysis_request.py
-from pydantic import BaseModel, Field, validator
+from pydantic import BaseModel, Field, field_validator
+from core.config import settings
 
 class AnalysisRequest(BaseModel):
     query: str = Field(..., description="Twitter username or search query")
@@ -8,9 +9,9 @@ class AnalysisRequest(BaseModel):
         description="Number of tweets to analyze",
     )
 
-    @validator("count")
+    @field_validator("count")
+    @classmethod
     def count_must_be_positive_and_within_limits(cls, value):
-        from core.config import settings
         if value <= 0:
             raise ValueError("Count must be a positive integer")
         if value > settings.MAX_TWEET_COUNT:
@@ -1,5 +1,6 @@
 # backend/app/schemas/user_tweets_request.py
-from pydantic import BaseModel, Field, validator
+from pydantic import BaseModel, Field, field_validator
+from core.config import settings
 
 class UserTweetsRequest(BaseModel):
     username: str = Field(..., description="Twitter username to fetch tweets from")
@@ -8,9 +9,9 @@ class UserTweetsRequest(BaseModel):
         description="Maximum number of tweets to fetch",
     )
 
-    @validator("max_tweets")
+    @field_validator("max_tweets")
+    @classmethod
     def max_tweets_must_be_positive_and_within_limits(cls, value):
-        from core.config import settings
         if value <= 0:
             raise ValueError("Max tweets must be a positive integer")
         if value > settings.MAX_TWEET_COUNT:
@@ -1,88 +1,237 @@
 # backend/service/sentiment_service.py
-from transformers import pipeline
+import torch
+from transformers import pipeline, AutoTokenizer
 from typing import List, Dict, Tuple
 from functools import lru_cache
 import logging
 import time
+import hashlib
+import re
+import unicodedata
+import heapq
+import threading
+from cachetools import LRUCache
 from datetime import datetime
+from collections import Counter
 from supabase import Client
+from fastapi.concurrency import run_in_threadpool
 from utils.helpers import map_sentiment_label
 import sys
 import os
 from schemas import analysis_response
 from db import crud
+from core.config import settings
 
-# Set up basic logging
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+SENTIMENT_MODEL = "cardiffnlp/twitter-roberta-base-sentiment"
+# Texts are run through the model in mini-batches; tweets fit well within 128 tokens
+SENTIMENT_BATCH_SIZE = 32
+SENTIMENT_MAX_LENGTH = 128
+
+# Results keyed by text hash, so duplicate texts (retweets, copy-pasted replies) skip the model
+_sentiment_cache = LRUCache(maxsize=settings.SENTIMENT_CACHE_SIZE)
+_sentiment_cache_lock = threading.Lock()
+
+# Retweets repeat the original text after an "RT @user:" prefix
+_RETWEET_PREFIX = re.compile(r"^RT @\w+:\s*")
+
+# Texts too trivial for the model (very short, a bare URL, only emoji) are labelled neutral directly
+TRIVIAL_TEXT_MIN_LENGTH = 3
+TRIVIAL_RESULT = {"label": "LABEL_1", "score": 0.5}
+_URL_ONLY = re.compile(r"https?://\S+")
+# Unicode categories emoji sequences are made of: symbols, modifiers, joiners and variation selectors
+_EMOJI_CATEGORIES = frozenset({"So", "Sk", "Mn", "Cf"})
+
+def _is_trivial_text(text: str) -> bool:
+    stripped = text.strip()
+    if len(stripped) < TRIVIAL_TEXT_MIN_LENGTH or _URL_ONLY.fullmatch(stripped):
+        return True
+    return all(char.isspace() or unicodedata.category(char) in _EMOJI_CATEGORIES for char in stripped)
+
+def _text_key(text: str) -> bytes:
+    """
+    Cache key of a text: the hash of the text without its retweet prefix and surrounding whitespace.
+    Case is kept because the model is case-sensitive.
+    """
+    normalized = _RETWEET_PREFIX.sub("", text).strip()
+    return hashlib.blake2b(normalized.encode("utf-8"), digest_size=16).digest()
+
+def _load_onnx_pipeline(model_dir: str, file_name: str):
+    """
+    Loads the int8 quantized ONNX export of the sentiment model.
+    Returns None when optimum[onnxruntime] is not installed.
+    """
+    try:
+        from optimum.onnxruntime import ORTModelForSequenceClassification
+    except ImportError:
+        logger.warning("optimum[onnxruntime] is not installed, falling back to the PyTorch sentiment model")
+        return None
+
+    model = ORTModelForSequenceClassification.from_pretrained(model_dir, file_name=file_name)
+    tokenizer = AutoTokenizer.from_pretrained(model_dir)
+    return pipeline("sentiment-analysis", model=model, tokenizer=tokenizer)
+
+# Filler text appended to the last mini-batch of a compiled model; its results are dropped
+FILLER_TEXT = "."
+
+# Set once torch.compile has actually been applied, which the ONNX fallback to PyTorch can do even with SENTIMENT_ONNX_MODEL_DIR set
+_model_compiled = False
+
+def _uses_fixed_shape() -> bool:
+    """
+    Compiled models are only valid for one input shape, so every batch must be
+    SENTIMENT_BATCH_SIZE texts padded to SENTIMENT_MAX_LENGTH tokens.
+    """
+    return _model_compiled
+
+def _padding_strategy():
+    """
+    Pads every batch to SENTIMENT_MAX_LENGTH for compiled models, otherwise to the longest text of the batch.
+    """
+    return "max_length" if _uses_fixed_shape() else True
+
+def _compile_pipeline_model(sentiment_pipeline):
+    """
+    Compiles the pipeline's model with torch.compile and warms it up on the fixed batch shape.
+    analyze_sentiment fills the last mini-batch up to SENTIMENT_BATCH_SIZE, so this is the only shape the model sees.
+    """
+    global _model_compiled
+    logger.info("Compiling sentiment model with torch.compile")
+    sentiment_pipeline.model = torch.compile(sentiment_pipeline.model, mode="reduce-overhead", dynamic=False)
+    _model_compiled = True
+    warmup_texts = ["warmup"] * SENTIMENT_BATCH_SIZE
+    for _ in range(2):
+        sentiment_pipeline(
+            warmup_texts,
+            batch_size=SENTIMENT_BATCH_SIZE,
+            truncation=True,
+            padding="max_length",
+            max_length=SENTIMENT_MAX_LENGTH,
+        )
+
 @lru_cache(maxsize=1)
 def get_sentiment_pipeline():
     """
     Loads the sentiment analysis model, cached for efficiency.
+    Uses the quantized ONNX model when SENTIMENT_ONNX_MODEL_DIR is set.
     """
     logger.info("Loading sentiment analysis model")
     start_time = time.time()
-    sentiment_pipeline = pipeline("sentiment-analysis", model="cardiffnlp/twitter-roberta-base-sentiment")
+    sentiment_pipeline = None
+    if settings.SENTIMENT_ONNX_MODEL_DIR:
+        sentiment_pipeline = _load_onnx_pipeline(settings.SENTIMENT_ONNX_MODEL_DIR, settings.SENTIMENT_ONNX_FILE)
+    if sentiment_pipeline is None:
+        if torch.cuda.is_available():
+            # Half precision halves memory traffic and runs on the GPU's tensor cores
+            device, dtype = 0, torch.float16
+        else:
+            device, dtype = -1, torch.float32
+            torch.set_num_threads(os.cpu_count() or 1)
+        sentiment_pipeline = pipeline("sentiment-analysis", model=SENTIMENT_MODEL, device=device, torch_dtype=dtype)
+        if settings.SENTIMENT_TORCH_COMPILE:
+            _compile_pipeline_model(sentiment_pipeline)
     end_time = time.time()
-    logger.info(f"Sentiment model loaded in {end_time - start_time:.2f} seconds")
+    logger.info("Sentiment model loaded in %.2f seconds", end_time - start_time)
     return sentiment_pipeline
 
 def analyze_sentiment(texts: List[str]) -> List[Dict]:
     """
     Analyzes the sentiment of a list of texts.
+    Results are returned in the same order as the texts.
+    Texts that were scored before are served from the cache, and trivial texts skip the model.
     """
     if not texts:
         logger.warning("No texts provided for sentiment analysis")
         return []
 
-    sentiment_pipeline = get_sentiment_pipeline()
-    
-    try:
-        results = sentiment_pipeline(texts)
-        return results
-    except Exception as e:
-        logger.error(f"Error during sentiment analysis: {e}")
-        return []
+    keys = [_text_key(text) for text in texts]
+    cached = {}
+    with _sentiment_cache_lock:
+        for key in keys:
+            if key in _sentiment_cache:
+                cached[key] = _sentiment_cache[key]
+
+    # Score each uncached text once, even if it repeats within this call
+    pending = {}
+    for key, text in zip(keys, texts):
+        if key in cached or key in pending:
+            continue
+        if _is_trivial_text(text):
+            cached[key] = TRIVIAL_RESULT
+        else:
+            pending[key] = text
+    logger.info("Sentiment cache: %s hits, %s texts to score", len(texts) - len(pending), len(pending))
+
+    if pending:
+        sentiment_pipeline = get_sentiment_pipeline()
+        pending_keys = list(pending)
+        try:
+            # Sort by token count so each mini-batch only pads to the longest of similar-length texts
+            token_ids = sentiment_pipeline.tokenizer(
+                [pending[key] for key in pending_keys], truncation=True, max_length=SENTIMENT_MAX_LENGTH
+            )["input_ids"]
+            token_lengths = {key: len(ids) for key, ids in zip(pending_keys, token_ids)}
+            pending_keys.sort(key=token_lengths.__getitem__)
+            batch_texts = [pending[key] for key in pending_keys]
+            if _uses_fixed_shape():
+                # A smaller tail batch would change the batch dimension and recompile the model
+                batch_texts += [FILLER_TEXT] * (-len(batch_texts) % SENTIMENT_BATCH_SIZE)
+            scored = sentiment_pipeline(
+                batch_texts,
+                batch_size=SENTIMENT_BATCH_SIZE,
+                truncation=True,
+                padding=_padding_strategy(),
+                max_length=SENTIMENT_MAX_LENGTH,
+            )[:len(pending_keys)]
+        except Exception as e:
+            logger.error("Error during sentiment analysis: %s", e)
+            return []
+
+        with _sentiment_cache_lock:
+            for key, result in zip(pending_keys, scored):
+                _sentiment_cache[key] = result
+                cached[key] = result
+
+    return [cached[key] for key in keys]
 
 def calculate_summary(sentiments: List[str]) -> Dict[str, float]:
     """
     Calculates the percentage of positive, neutral, and negative sentiments.
     """
-    logger.info(f"Calculating summary for {len(sentiments)} sentiments")
-    print(f"Sentiments list: {sentiments}")
+    logger.info("Calculating summary for %s sentiments", len(sentiments))
     total = len(sentiments)
     if total == 0:
         return {"positive": 0.0, "neutral": 0.0, "negative": 0.0}
 
-    positive_count = sentiments.count("positive")
-    neutral_count = sentiments.count("neutral")
-    negative_count = sentiments.count("negative")
-
-    summary = {
-        "positive": round(positive_count / total, 2),
-        "neutral": round(neutral_count / total, 2),
-        "negative": round(negative_count / total, 2),
-    }
-    logger.info(f"Sentiment summary: {summary}")
+    counts = Counter(sentiments)
+    summary = {label: round(counts[label] / total, 2) for label in ("positive", "neutral", "negative")}
+    logger.info("Sentiment summary: %s", summary)
     return summary
 
-def get_top_tweets(tweets: List[Dict], key: str, n: int = 5) -> List[Dict]:
-    """Gets the top N tweets for a given sentiment."""
-    logger.info(f"Getting top {n} tweets for sentiment '{key}'")
-    filtered_tweets = [tweet for tweet in tweets if map_sentiment_label(tweet["sentiment"]) == key]
-    sorted_tweets = sorted(filtered_tweets, key=lambda x: x["score"], reverse=True)[:n]
-    return sorted_tweets
+def get_top_tweets(tweets: List[Dict], n: int = 5) -> Dict[str, List[Dict]]:
+    """
+    Gets the top N tweets of each sentiment in a single pass over the tweets.
+    Expects tweets whose "sentiment" is already mapped to positive/neutral/negative.
+    """
+    logger.info("Getting top %s tweets for each sentiment", n)
+    buckets = {"positive": [], "neutral": [], "negative": []}
+    for tweet in tweets:
+        bucket = buckets.get(tweet["sentiment"])
+        if bucket is not None:
+            bucket.append(tweet)
+    return {key: heapq.nlargest(n, bucket, key=lambda x: x["score"]) for key, bucket in buckets.items()}
 
 def prepare_graph_data(summary: Dict, analysis_id: int ,query: str):
+    today = datetime.now().strftime("%Y-%m-%d")
     graph_data = [{
         "analysis_id": analysis_id,
-        "date": datetime.now().strftime("%Y-%m-%d"),
+        "date": today,
         "positive": summary["positive"],
         "neutral": summary["neutral"],
         "negative": summary["negative"],
         "username": query,
-        "created_at": datetime.now().strftime("%Y-%m-%d"),
+        "created_at": today,
     }]
     return graph_data
 
@@ -90,13 +239,14 @@ async def perform_sentiment_analysis_and_store(supabase: Client, query: str, cou
     """
     Performs sentiment analysis, stores results in Supabase, and returns analysis response.
     Skips tweets that already exist in the database.
+    Model inference and Supabase calls run in the threadpool so the event loop stays free.
     """
-    logger.info(f"Starting sentiment analysis for query '{query}' with {len(tweets_data)} tweets")
+    logger.info("Starting sentiment analysis for query '%s' with %s tweets", query, len(tweets_data))
 
     # 1. Create Analysis record in Supabase
-    db_analysis = crud.create_analysis(supabase, username=query, query_parameters={"count": count})
+    db_analysis = await run_in_threadpool(crud.create_analysis, supabase, username=query, query_parameters={"count": count})
     analysis_id = db_analysis["analysis_id"]
-    logger.info(f"Created analysis record with ID: {analysis_id}")
+    logger.info("Created analysis record with ID: %s", analysis_id)
 
     all_texts = []
     all_processed_tweets = []
@@ -108,20 +258,21 @@ async def perform_sentiment_analysis_and_store(supabase: Client, query: str, cou
 
     # 2. Analyze Sentiment
     logger.info("Analyzing sentiment for all texts")
-    sentiments = analyze_sentiment(all_texts)
+    sentiments = await run_in_threadpool(analyze_sentiment, all_texts)
 
     processed_tweets_for_response = []
+    db_tweets = []
     all_sentiments = []
 
     # 3. Process Results and Store Tweets in Supabase
     logger.info("Processing sentiment results and storing tweets")
     for i, sentiment_result in enumerate(sentiments):
-        sentiment_label = sentiment_result['label']
+        sentiment_label = map_sentiment_label(sentiment_result['label'])
         score = sentiment_result['score']
         tweet_data = all_processed_tweets[i]
 
         # Store sentiment for summary calculation
-        all_sentiments.append(map_sentiment_label(sentiment_label))
+        all_sentiments.append(sentiment_label)
 
         # Prepare tweet data for Supabase
         db_tweet_data = {
@@ -130,7 +281,7 @@ async def perform_sentiment_analysis_and_store(supabase: Client, query: str, cou
             "username": tweet_data['username'],
             "text": tweet_data['text'],
             "created_at": tweet_data['created_at'].isoformat() if isinstance(tweet_data['created_at'], datetime) else tweet_data['created_at'],
-            "sentiment": map_sentiment_label(sentiment_label),
+            "sentiment": sentiment_label,
             "score": float(score)  # Changed from "sentiment_score" to "score"
         }
 
@@ -138,16 +289,19 @@ async def perform_sentiment_analysis_and_store(supabase: Client, query: str, cou
         # Changing format for crud operations
         modified_tweet_data = db_tweet_data.copy()
         modified_tweet_data["tweet_id"] = modified_tweet_data.pop("id")
-        # Store tweet in Supabase, skipping if it already exists
-        stored_tweet = crud.create_tweet(supabase, modified_tweet_data, analysis_id) # Need to input twitter_id
+        db_tweets.append(modified_tweet_data)
+
+    # Store all tweets in Supabase in one request, skipping the ones that already exist
+    await run_in_threadpool(crud.create_tweets_bulk, supabase, db_tweets, analysis_id)
 
     # 4. Calculate sentiment summary
     logger.info("Calculating sentiment summary")
-    sentiment_summary = calculate_summary(all_sentiments)  # all_sentiments consist of labels like LABEL_1, LABEL_2 etc.
+    sentiment_summary = calculate_summary(all_sentiments)  # all_sentiments consist of mapped labels: positive, neutral, negative
 
     # 5. Update analysis with summary
     logger.info("Updating analysis with summary")
-    updated_analysis = crud.update_analysis_summary(
+    updated_analysis = await run_in_threadpool(
+        crud.update_analysis_summary,
         supabase,
         analysis_id,
         sentiment_summary,
@@ -156,9 +310,10 @@ async def perform_sentiment_analysis_and_store(supabase: Client, query: str, cou
 
     # 6. Get top tweets for each sentiment
     logger.info("Getting top tweets for each sentiment")
-    top_positive = get_top_tweets(processed_tweets_for_response, "positive")
-    top_neutral = get_top_tweets(processed_tweets_for_response, "neutral")
-    top_negative = get_top_tweets(processed_tweets_for_response, "negative")
+    top_tweets = get_top_tweets(processed_tweets_for_response)
+    top_positive = top_tweets["positive"]
+    top_neutral = top_tweets["neutral"]
+    top_negative = top_tweets["negative"]
 
     # 7. Prepare graph data
     logger.info("Preparing graph data")
@@ -166,7 +321,7 @@ async def perform_sentiment_analysis_and_store(supabase: Client, query: str, cou
 
     # 8. Store graph data in Supabase ==> Need to be Fixed the Issue to that date format is not correct.
     logger.info("Storing graph data in Supabase")
-    stored_graph_data = crud.create_graph_data(supabase, graph_data)
+    await run_in_threadpool(crud.create_graph_data, supabase, graph_data)
 
     # 9. Create and return response
     logger.info("Creating analysis response")
@@ -180,7 +335,7 @@ async def perform_sentiment_analysis_and_store(supabase: Client, query: str, cou
             graph_data=graph_data
         )
     except Exception as e:
-        logger.error(f"Error creating analysis response: {e}")
+        logger.error("Error creating analysis response: %s", e)
         raise
 
     logger.info("Sentiment analysis and storage completed successfully")
@@ -1,8 +1,9 @@
-import json
+import orjson
+import asyncio
 from twikit import Client
+from fastapi.concurrency import run_in_threadpool
 from core.config import settings
 from typing import List, Dict, Optional
-from datetime import datetime, timedelta
 import logging
 import csv
 import time
@@ -16,36 +17,72 @@ from service.sentiment_service import calculate_summary, prepare_graph_data
 from schemas.user_tweets_response import UserTweetsResponse, TweetData
 
 
-# Set up basic logging
-print("Loading twitter_service.py module")
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
+logger.debug("Loading twitter_service.py module")
+
+# Reply fetches in flight at once; kept low to stay within Twitter's rate limits
+REPLY_FETCH_CONCURRENCY = 5
+
+# Wait used when a rate-limit error doesn't say when the limit resets
+DEFAULT_RATE_LIMIT_WAIT = 100  # seconds
+
+def rate_limit_wait(error: TooManyRequests) -> float:
+    """Seconds to wait until the rate limit of `error` resets, at least one."""
+    reset = getattr(error, 'rate_limit_reset', None)
+    if not reset:
+        return DEFAULT_RATE_LIMIT_WAIT
+    return max(1, reset - time.time())
+
+# Cookies don't change while the process runs, so each file is parsed only once
+_cookies_cache: Dict[str, dict] = {}
 
 async def load_cookies(filename: str) -> Optional[dict]:
+    """
+    Loads Twikit cookies from a JSON file, cached after the first successful load.
+    """
+    if filename in _cookies_cache:
+        return _cookies_cache[filename]
     try:
-        with open(filename, 'r') as f:
-            cookies = json.load(f)
+        with open(filename, 'rb') as f:
+            cookies = orjson.loads(f.read())
+        _cookies_cache[filename] = cookies
         return cookies
-    except (FileNotFoundError, json.JSONDecodeError) as e:
-        print(f"[DEBUG] Error loading cookies: {e}")
-        logger.error(f"Error loading cookies from {filename}: {e}")
+    except (FileNotFoundError, orjson.JSONDecodeError) as e:
+        logger.error("Error loading cookies from %s: %s", filename, e)
         return None
 
-async def get_tweets(query: str, count: int) -> List[dict]:
-    client = Client('en-US')
+# One Twikit client for the whole process, so its HTTP connections to Twitter are reused
+_client: Optional[Client] = None
+_client_lock = asyncio.Lock()
 
-    cookies = await load_cookies(settings.TWIKIT_COOKIES_FILE)
-    if not cookies:
-        print("[DEBUG] No cookies loaded, returning empty tweet list")
+async def get_client() -> Optional[Client]:
+    """
+    Returns the shared Twikit client, created with the account cookies on first use.
+    Returns None when the cookies can't be loaded.
+    """
+    global _client
+    async with _client_lock:
+        if _client is None:
+            cookies = await load_cookies(settings.TWIKIT_COOKIES_FILE)
+            if not cookies:
+                return None
+            client = Client('en-US')
+            client.set_cookies(cookies)
+            _client = client
+    return _client
+
+async def get_tweets(query: str, count: int) -> List[dict]:
+    client = await get_client()
+    if not client:
+        logger.debug("No cookies loaded, returning empty tweet list")
         return []
-    client.set_cookies(cookies)
     try:
         tweets = await client.search_tweet(query, 'Latest', count=count)
 
-        tweet_data = [get_tweet_data(tweet) for tweet in tweets]
+        tweet_data = await get_tweets_data(tweets)
         return tweet_data
     except Exception as e:
-        logger.error(f"Error during tweet retrieval: {e}")
+        logger.error("Error during tweet retrieval: %s", e)
         return []
 
 async def get_replies_for_tweet(tweet_id: int) -> List[Dict]:
@@ -59,45 +96,46 @@ async def get_replies_for_tweet(tweet_id: int) -> List[Dict]:
         replies = await get_replies(str(tweet_id), count=30)
 
         if replies:
-            reply_texts = [reply.text for reply in replies]
-            sentiments = analyze_sentiment(reply_texts)
-
-            for reply, sentiment in zip(replies, sentiments):
-                reply.sentiment = map_sentiment_label(sentiment['label'])
-                reply.score = sentiment['score']
-
-            return [get_tweet_data(reply) for reply in replies]
+            return await get_tweets_data(replies)
         return []
     except Exception as e:
-        logger.error(f"Error fetching replies for tweet {tweet_id}: {e}")
+        logger.error("Error fetching replies for tweet %s: %s", tweet_id, e)
         return []
 
+async def get_replies_for_tweets(tweet_ids: List[int], concurrency: int = REPLY_FETCH_CONCURRENCY) -> List[List[Dict]]:
+    """
+    Fetches replies for several tweets concurrently, at most `concurrency` tweets at a time.
+    Returns one list of replies per tweet, in the order of tweet_ids.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def fetch(tweet_id: int) -> List[Dict]:
+        async with semaphore:
+            return await get_replies_for_tweet(tweet_id)
+
+    return await asyncio.gather(*(fetch(tweet_id) for tweet_id in tweet_ids))
+
 async def get_replies(tweet_id: str, count: int) -> list:
     """
     Fetch up to `count` replies for a given tweet_id using pagination.
     """
-    client = Client('en-US')
     all_replies = []
     cursor = ""
 
     try:
-        # Load cookies
-        cookies = await load_cookies(settings.TWIKIT_COOKIES_FILE)
-        if not cookies:
+        client = await get_client()
+        if not client:
             return []
 
-        client.set_cookies(cookies)
-
         while len(all_replies) < count:
             try:
                 result = await client._get_more_replies(tweet_id, cursor)
                 if len(result) == 1:
                     break
             except TooManyRequests as e:
-                # rate_limit_reset = datetime.fromtimestamp(e.rate_limit_reset)
-                print(f"[DEBUG] Rate limit exceeded. Resetting at {datetime.now()}")
-                # wait_time = (rate_limit_reset - datetime.now()).total_seconds()
-                time.sleep(100)
+                wait_time = rate_limit_wait(e)
+                logger.warning("Rate limit exceeded. Waiting %.0f seconds", wait_time)
+                await asyncio.sleep(wait_time)
                 continue
 
             if not hasattr(result, '_Result__results') or not result._Result__results:
@@ -113,20 +151,37 @@ async def get_replies(tweet_id: str, count: int) -> list:
         return all_replies
 
     except Exception as e:
-        logger.error(f"Error in get_replies: {e}")
+        logger.error("Error in get_replies: %s", e)
+        return []
+
+def get_tweet_text(tweet) -> str:
+    """Returns the full text of a twikit tweet."""
+    legacy_data = getattr(tweet, '_legacy', None) or {}
+    return legacy_data.get('full_text', '')
+
+async def get_tweets_data(tweets: list) -> List[Dict]:
+    """
+    Formats twikit tweets with get_tweet_data.
+    Sentiment for all of them is computed in one batched model call, run in the threadpool so the event loop stays free.
+    """
+    if not tweets:
         return []
+    texts = [get_tweet_text(tweet) for tweet in tweets]
+    sentiments = await run_in_threadpool(analyze_sentiment, texts) or [None] * len(tweets)
+    return [get_tweet_data(tweet, sentiment) for tweet, sentiment in zip(tweets, sentiments)]
 
-def get_tweet_data(tweet) -> Dict:
-    """Enhanced tweet data formatting with additional metrics"""
+def get_tweet_data(tweet, sentiment: Optional[Dict] = None) -> Dict:
+    """
+    Enhanced tweet data formatting with additional metrics.
+    `sentiment` is the model result for the tweet text, computed by the caller.
+    """
     try:
-        legacy_data = tweet._legacy if hasattr(tweet, '_legacy') else {}
-        core_data = tweet._data.get('core', {}) if hasattr(tweet, '_data') else {}
+        legacy_data = getattr(tweet, '_legacy', None) or {}
+        core_data = (getattr(tweet, '_data', None) or {}).get('core', {})
         user_data = core_data.get('user_results', {}).get('result', {}).get('legacy', {})
 
         text = legacy_data.get('full_text', '')
-        # Analyze sentiment for each tweet
-        sentiment_results = analyze_sentiment([text])
-        sentiment = sentiment_results[0] if sentiment_results else {}
+        sentiment = sentiment or {}
 
         return {
             'id': getattr(tweet, 'id', ''),
@@ -141,7 +196,7 @@ def get_tweet_data(tweet) -> Dict:
             'score': float(sentiment.get('score', 0.0))
         }
     except Exception as e:
-        logger.error(f"Error processing tweet data: {e}")
+        logger.error("Error processing tweet data: %s", e)
         return {'error': str(e)}
 
 async def fetch_user_tweets_and_replies(username: str, max_tweets: int, supabase: Client):
@@ -160,10 +215,10 @@ async def fetch_user_tweets_and_replies(username: str, max_tweets: int, supabase
         UserTweetsResponse: Structured response containing fetched tweets data.
     """
     # First try to get tweets from database
-    existing_data = crud.fetch_latest_tweets_by_username(supabase, username)
+    existing_data = await run_in_threadpool(crud.fetch_latest_tweets_by_username, supabase, username)
     if existing_data:
-        logger.info(f"Found existing tweets in database for user {username}")
-        logger.info(f"We Already have the latest tweets for the user {username}")
+        logger.info("Found existing tweets in database for user %s", username)
+        logger.info("We Already have the latest tweets for the user %s", username)
         return UserTweetsResponse(
             username= username,
             tweet_count = 0, # No Need to do any operations as we already have latest data
@@ -171,13 +226,11 @@ async def fetch_user_tweets_and_replies(username: str, max_tweets: int, supabase
         )
 
     # If no tweets in database, fetch from Twitter
-    client = Client('en-US')
     tweets_data_list: List[Dict] = []
 
-    cookies = await load_cookies(settings.TWIKIT_COOKIES_FILE)
-    if not cookies:
+    client = await get_client()
+    if not client:
         return None
-    client.set_cookies(cookies)
 
     try:
         user = await client.get_user_by_screen_name(username)
@@ -191,31 +244,54 @@ async def fetch_user_tweets_and_replies(username: str, max_tweets: int, supabase
         tweets = []
         tweets.extend(tweets_batch)  # --> Thought is this is getting more tweets than asked
 
-        analysis = crud.create_analysis(supabase, username=username, query_parameters={"max_tweets": max_tweets})
+        analysis = await run_in_threadpool(crud.create_analysis, supabase, username=username, query_parameters={"max_tweets": max_tweets})
         analysis_id = analysis["analysis_id"]
-        logger.info(f"Created analysis record with ID: {analysis_id}")
+        logger.info("Created analysis record with ID: %s", analysis_id)
+
+        # Look up which of these tweets are already stored with one query
+        existing_tweet_ids = await run_in_threadpool(crud.check_tweets_exist, supabase, [str(tweet.id) for tweet in tweets])
 
-        for tweet in tweets:
-            tweet_data = get_tweet_data(tweet)
+        # Skip tweets that already exist in database before scoring, so only new posts go through the model
+        new_tweets = [tweet for tweet in tweets if str(tweet.id) not in existing_tweet_ids]
+        logger.debug("Skipping %s tweets that already exist in database", len(tweets) - len(new_tweets))
+
+        new_posts = await get_tweets_data(new_tweets)
+        for tweet_data in new_posts:
             tweet_data['type'] = 'Post'
-            
-            # Skip if tweet already exists in database
-            if crud.check_tweet_exists(supabase, str(tweet_data['id'])):
-                logger.info(f"Tweet {tweet_data['id']} already exists in database, skipping")
-                break
-                
-            tweet_db_data = await store_tweet_and_replies_with_sentiment(supabase, tweet_data, analysis_id)
-            tweets_data_list.append(tweet_db_data)
-            
-            replies = await get_replies_for_tweet(tweet_data['id'])
-            print(f"[DEBUG] These are the replies fetched :: {len(replies)}")
-            for reply in replies:
-                reply_data = reply
-                reply_data['type'] = 'Reply'
-                print(f"[DEBUG] Checking replys in DB or Storing in the database")
-                # Skip if reply already exists in database
-                reply_db_data = await store_tweet_and_replies_with_sentiment(supabase, reply_data, analysis_id)
-                tweets_data_list.append(reply_db_data)
+
+        # Write the posts in the background while their replies are fetched
+        post_rows = [prepare_db_tweet(tweet_data) for tweet_data in new_posts]
+        posts_written = asyncio.create_task(
+            run_in_threadpool(crud.create_tweets_bulk, supabase, post_rows, analysis_id)
+        )
+
+        try:
+            # Fetch replies of all new posts concurrently, then keep each post followed by its replies
+            replies_per_post = await get_replies_for_tweets([tweet_data['id'] for tweet_data in new_posts])
+
+            # Replies stored by an earlier analysis are skipped too, again with one lookup for all of them
+            existing_reply_ids = await run_in_threadpool(
+                crud.check_tweets_exist, supabase, [str(reply['id']) for replies in replies_per_post for reply in replies]
+            )
+
+            reply_rows = []
+            for post_row, replies in zip(post_rows, replies_per_post):
+                tweets_data_list.append(post_row)
+                logger.debug("These are the replies fetched :: %s", len(replies))
+                for reply in replies:
+                    if str(reply['id']) in existing_reply_ids:
+                        continue
+                    reply_data = reply
+                    reply_data['type'] = 'Reply'
+                    reply_row = prepare_db_tweet(reply_data)
+                    reply_rows.append(reply_row)
+                    tweets_data_list.append(reply_row)
+
+            # Store the replies with bulk upserts
+            await run_in_threadpool(crud.create_tweets_bulk, supabase, reply_rows, analysis_id)
+        finally:
+            # Wait for the posts even when the replies failed, so the write's outcome is never lost
+            await posts_written
 
         if not tweets_data_list:
             return UserTweetsResponse(
@@ -229,12 +305,12 @@ async def fetch_user_tweets_and_replies(username: str, max_tweets: int, supabase
         sentiment_summary = calculate_summary(all_sentiments)
 
         # Update analysis with summary
-        crud.update_analysis_summary(supabase, analysis_id, sentiment_summary, len(tweets_data_list))
+        await run_in_threadpool(crud.update_analysis_summary, supabase, analysis_id, sentiment_summary, len(tweets_data_list))
 
         graph_data = prepare_graph_data(sentiment_summary, analysis_id, username)
 
         # Store graph data
-        crud.create_graph_data(supabase, graph_data)
+        await run_in_threadpool(crud.create_graph_data, supabase, graph_data)
 
         return UserTweetsResponse(
             username= username,
@@ -243,26 +319,21 @@ async def fetch_user_tweets_and_replies(username: str, max_tweets: int, supabase
         )
 
     except Exception as e:
-        logger.error(f"Error during tweet retrieval: {e}")
+        logger.error("Error during tweet retrieval: %s", e)
         return None
 
-async def store_tweet_and_replies_with_sentiment(supabase: Client, tweet_data: Dict, analysis_id: int) -> Dict:
+def prepare_db_tweet(tweet_data: Dict) -> Dict:
     """
-    Analyzes sentiment of a tweet and its replies, stores tweet and replies in Supabase.
+    Prepares a tweet or reply for crud.create_tweets_bulk, using the sentiment already computed by get_tweet_data.
     """
-    text = tweet_data['text']
-    sentiment_results = analyze_sentiment([text])
-    sentiment = sentiment_results[0] if sentiment_results else {}
-
     # Prepare tweet data for database
     db_tweet_data = {
         "tweet_id": tweet_data['id'],
         "type": tweet_data['type'],
         "username": tweet_data['username'],
-        "text": text,
+        "text": tweet_data['text'],
         "created_at": tweet_data['created_at'],
-        "sentiment": map_sentiment_label(sentiment.get('label', 'neutral')),
-        "score": float(sentiment.get('score', 0.0))
+        "sentiment": map_sentiment_label(tweet_data['sentiment']),
+        "score": tweet_data['score']
     }
-    stored_tweet = crud.create_tweet(supabase, db_tweet_data, analysis_id)
     return db_tweet_data
\ No newline at end of file
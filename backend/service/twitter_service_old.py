@@ -1,9 +1,8 @@
 # backend/app/services/twitter_service.py
-import json
+import asyncio
 from twikit import Client
-from core.config import settings
+from fastapi.concurrency import run_in_threadpool
 from typing import List, Dict, Optional
-from datetime import datetime, timedelta
 import logging
 import csv
 import time
@@ -13,46 +12,40 @@ from service.sentiment_service import analyze_sentiment    # perform_sentiment_a
 from utils.helpers import map_sentiment_label
 from db import crud
 from db.database import get_supabase_client
+from service.twitter_service import get_client
 
-# Set up basic logging
-print("Loading twitter_service.py module")
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
+logger.debug("Loading twitter_service.py module")
 
-async def load_cookies(filename: str) -> Optional[dict]:
-    print(f"[DEBUG] Attempting to load cookies from: {filename}")
-    try:
-        with open(filename, 'r') as f:
-            cookies = json.load(f)
-        print(f"[DEBUG] Successfully loaded cookies from {filename}")
-        return cookies
-    except (FileNotFoundError, json.JSONDecodeError) as e:
-        print(f"[DEBUG] Error loading cookies: {e}")
-        logger.error(f"Error loading cookies from {filename}: {e}")
-        return None
+# Reply fetches in flight at once; kept low to stay within Twitter's rate limits
+REPLY_FETCH_CONCURRENCY = 5
 
-async def get_tweets(query: str, count: int) -> List[dict]:
-    print(f"[DEBUG] get_tweets called with query='{query}', count={count}")
-    client = Client('en-US')
+# Wait used when a rate-limit error doesn't say when the limit resets
+DEFAULT_RATE_LIMIT_WAIT = 100  # seconds
+
+def rate_limit_wait(error: TooManyRequests) -> float:
+    """Seconds to wait until the rate limit of `error` resets, at least one."""
+    reset = getattr(error, 'rate_limit_reset', None)
+    if not reset:
+        return DEFAULT_RATE_LIMIT_WAIT
+    return max(1, reset - time.time())
 
-    print(f"[DEBUG] Loading cookies from {settings.TWIKIT_COOKIES_FILE}")
-    cookies = await load_cookies(settings.TWIKIT_COOKIES_FILE)
-    if not cookies:
-        print("[DEBUG] No cookies loaded, returning empty tweet list")
+async def get_tweets(query: str, count: int) -> List[dict]:
+    logger.debug("get_tweets called with query='%s', count=%s", query, count)
+    client = await get_client()
+    if not client:
+        logger.debug("No cookies loaded, returning empty tweet list")
         return []
-    print("[DEBUG] Setting cookies to client")
-    client.set_cookies(cookies)
     try:
-        print(f"[DEBUG] Searching for tweets with query='{query}', count={count}")
+        logger.debug("Searching for tweets with query='%s', count=%s", query, count)
         tweets = await client.search_tweet(query, 'Latest', count=count)
-        print(f"[DEBUG] Retrieved {len(tweets)} tweets from API")
+        logger.debug("Retrieved %s tweets from API", len(tweets))
         
-        tweet_data = [get_tweet_data(tweet) for tweet in tweets]
-        print(f"[DEBUG] Processed {len(tweet_data)} tweets")
+        tweet_data = await get_tweets_data(tweets)
+        logger.debug("Processed %s tweets", len(tweet_data))
         return tweet_data
     except Exception as e:
-        print(f"[DEBUG] An error occurred during tweet retrieval: {e}")
-        logger.error(f"Error during tweet retrieval: {e}")
+        logger.error("Error during tweet retrieval: %s", e)
         return []
     
 async def get_replies_for_tweet(tweet_id: int) -> List[Dict]:
@@ -60,65 +53,65 @@ async def get_replies_for_tweet(tweet_id: int) -> List[Dict]:
     Fetches direct replies for a given tweet ID using pagination.
     Adds a random delay between 0-5 seconds to avoid rate limits.
     """
-    print(f"[DEBUG] get_replies_for_tweet called for tweet_id={tweet_id}")
+    logger.debug("get_replies_for_tweet called for tweet_id=%s", tweet_id)
     
     try:
         # Fetch replies using pagination
-        print(f"[DEBUG] Fetching replies for tweet {tweet_id}")
+        logger.debug("Fetching replies for tweet %s", tweet_id)
         replies = await get_replies(str(tweet_id))
         
         if replies:
-            print(f"[DEBUG] Found {len(replies)} replies for tweet {tweet_id}")
-            reply_texts = [reply.text for reply in replies]
-            sentiments = analyze_sentiment(reply_texts)
-            
-            for reply, sentiment in zip(replies, sentiments):
-                reply.sentiment = map_sentiment_label(sentiment['label'])
-                reply.score = sentiment['score']
-            
-            return [get_tweet_data(reply) for reply in replies]
+            logger.debug("Found %s replies for tweet %s", len(replies), tweet_id)
+            return await get_tweets_data(replies)
         return []
     except Exception as e:
-        print(f"[DEBUG] Error fetching replies for tweet {tweet_id}: {e}")
-        logger.error(f"Error fetching replies for tweet {tweet_id}: {e}")
+        logger.error("Error fetching replies for tweet %s: %s", tweet_id, e)
         return []
 
+async def get_replies_for_tweets(tweet_ids: List[int], concurrency: int = REPLY_FETCH_CONCURRENCY) -> List[List[Dict]]:
+    """
+    Fetches replies for several tweets concurrently, at most `concurrency` tweets at a time.
+    Returns one list of replies per tweet, in the order of tweet_ids.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def fetch(tweet_id: int) -> List[Dict]:
+        async with semaphore:
+            return await get_replies_for_tweet(tweet_id)
+
+    return await asyncio.gather(*(fetch(tweet_id) for tweet_id in tweet_ids))
+
 async def get_replies(tweet_id: str, count: int = 100) -> list:
     """
     Fetch up to `count` replies for a given tweet_id using pagination.
     """
-    print(f"[DEBUG] get_replies called for tweet_id={tweet_id}")
-    client = Client('en-US')
+    logger.debug("get_replies called for tweet_id=%s", tweet_id)
     all_replies = []
     cursor = ""
 
     try:
-        # Load cookies
-        cookies = await load_cookies(settings.TWIKIT_COOKIES_FILE)
-        if not cookies:
-            print("[DEBUG] No cookies loaded for reply fetching")
+        client = await get_client()
+        if not client:
+            logger.debug("No cookies loaded for reply fetching")
             return []
 
-        client.set_cookies(cookies)
-
         while len(all_replies) < count:
-            print(f"[DEBUG] Fetching replies batch with cursor: {cursor}")
+            logger.debug("Fetching replies batch with cursor: %s", cursor)
             try:
                 result = await client._get_more_replies(tweet_id, cursor)
                 if len(result) == 1:
                     break
             except TooManyRequests as e:
-                # rate_limit_reset = datetime.fromtimestamp(e.rate_limit_reset)
-                print(f"[DEBUG] Rate limit exceeded. Resetting at {datetime.now()}")
-                # wait_time = (rate_limit_reset - datetime.now()).total_seconds()
-                time.sleep(100)
+                wait_time = rate_limit_wait(e)
+                logger.warning("Rate limit exceeded. Waiting %.0f seconds", wait_time)
+                await asyncio.sleep(wait_time)
                 continue
             
             if not hasattr(result, '_Result__results') or not result._Result__results:
                 break
 
             all_replies.extend(result._Result__results)
-            print(f"[DEBUG] Added {len(result._Result__results)} replies, total: {len(all_replies)}")
+            logger.debug("Added %s replies, total: %s", len(result._Result__results), len(all_replies))
 
             if not hasattr(result, 'next_cursor'):
                 break
@@ -128,21 +121,38 @@ async def get_replies(tweet_id: str, count: int = 100) -> list:
         return all_replies
 
     except Exception as e:
-        print(f"[DEBUG] Error in get_replies: {e}")
-        logger.error(f"Error in get_replies: {e}")
+        logger.error("Error in get_replies: %s", e)
+        return []
+
+def get_tweet_text(tweet) -> str:
+    """Returns the full text of a twikit tweet."""
+    legacy_data = getattr(tweet, '_legacy', None) or {}
+    return legacy_data.get('full_text', '')
+
+async def get_tweets_data(tweets: list) -> List[Dict]:
+    """
+    Formats twikit tweets with get_tweet_data.
+    Sentiment for all of them is computed in one batched model call, run in the threadpool so the event loop stays free.
+    """
+    if not tweets:
         return []
+    texts = [get_tweet_text(tweet) for tweet in tweets]
+    sentiments = await run_in_threadpool(analyze_sentiment, texts) or [None] * len(tweets)
+    return [get_tweet_data(tweet, sentiment) for tweet, sentiment in zip(tweets, sentiments)]
 
-def get_tweet_data(tweet) -> Dict:
-    """Enhanced tweet data formatting with additional metrics"""
+def get_tweet_data(tweet, sentiment: Optional[Dict] = None) -> Dict:
+    """
+    Enhanced tweet data formatting with additional metrics.
+    `sentiment` is the model result for the tweet text, computed by the caller; its label is mapped to positive/neutral/negative.
+    """
     try:
-        legacy_data = tweet._legacy if hasattr(tweet, '_legacy') else {}
-        core_data = tweet._data.get('core', {}) if hasattr(tweet, '_data') else {}
+        legacy_data = getattr(tweet, '_legacy', None) or {}
+        core_data = (getattr(tweet, '_data', None) or {}).get('core', {})
         user_data = core_data.get('user_results', {}).get('result', {}).get('legacy', {})
 
         text = legacy_data.get('full_text', '')
-        # Analyze sentiment for each tweet
-        sentiment_results = analyze_sentiment([text])
-        sentiment = sentiment_results[0] if sentiment_results else {}
+        sentiment = sentiment or {}
+        sentiment_label, score = map_sentiment_label(sentiment.get('label', 'LABEL_1')), sentiment.get('score', 0.0)
 
         return {
             'id': getattr(tweet, 'id', ''),
@@ -153,124 +163,121 @@ def get_tweet_data(tweet) -> Dict:
             'replies': legacy_data.get('reply_count', 0),
             'retweets': legacy_data.get('retweet_count', 0),
             'quote_count': legacy_data.get('quote_count', 0),
-            'sentiment': sentiment.get('label', 'neutral'),
-            'score': float(sentiment.get('score', 0.0))
+            'sentiment': sentiment_label,
+            'score': float(score)
         }
     except Exception as e:
-        print(f"[DEBUG] Error processing tweet data: {e}")
-        logger.error(f"Error processing tweet data: {e}")
+        logger.error("Error processing tweet data: %s", e)
         return {'error': str(e)}
 
+CSV_HEADER = ['Tweet ID', 'Username', 'Text', 'Created At', 'Type', 'Sentiment', 'Score']
+
+def write_tweets_csv(file_path: str, rows: List[Dict]) -> None:
+    """
+    Writes tweet rows returned by fetch_user_tweets_and_replies to a CSV file.
+    Meant to run as a background task after the response is sent.
+    """
+    with open(file_path, 'w', newline='', encoding='utf-8') as file:
+        writer = csv.writer(file)
+        writer.writerow(CSV_HEADER)
+        writer.writerows(
+            [row['id'], row['username'], row['text'], row['created_at'], row['type'], row['sentiment'], row['score']]
+            for row in rows
+        )
+    logger.info("Wrote %s rows to %s", len(rows), file_path)
+
 async def fetch_user_tweets_and_replies(username: str, max_tweets: int, supabase: Client):
     """
     Fetch tweets and replies for a specific user.
     Uses the .next function to retrieve more tweets and adds random delays to avoid rate limits.
 
-    returns: CSV file with tweets and replies
+    returns: List of tweet and reply rows (id, username, text, created_at, type, sentiment, score), with mapped sentiment labels
     """
-    print(f"[DEBUG] fetch_user_tweets_and_replies called for username='{username}', max_tweets={max_tweets}")
-    client = Client('en-US')
-    
-    # Load cookies
-    print(f"[DEBUG] Loading cookies from {settings.TWIKIT_COOKIES_FILE}")
-    cookies = await load_cookies(settings.TWIKIT_COOKIES_FILE)
-    if not cookies:
-        print(f"[DEBUG] No cookies loaded for user {username}")
+    logger.debug("fetch_user_tweets_and_replies called for username='%s', max_tweets=%s", username, max_tweets)
+    # Shared with twitter_service, so the cookies are loaded and the client created only once per process
+    client = await get_client()
+    if not client:
+        logger.debug("No cookies loaded for user %s", username)
         return None
-    print(f"[DEBUG] Setting cookies to client for user {username}")
-    client.set_cookies(cookies)
     
     try:
         # Get user object by username
-        print(f"[DEBUG] Getting user by screen name: {username}")
+        logger.debug("Getting user by screen name: %s", username)
         user = await client.get_user_by_screen_name(username)
         if not user:
-            print(f"[DEBUG] User {username} not found.")
+            logger.debug("User %s not found.", username)
             return None
         
         # Fetch user's tweets
-        print(f"[DEBUG] Fetching tweets for user ID: {user.id}")
+        logger.debug("Fetching tweets for user ID: %s", user.id)
         tweets = []
         
         # Initial fetch
         batch = await client.get_user_tweets(user.id, tweet_type='Tweets', count=max_tweets)
         if batch:
             tweets.extend(batch)
-            print(f"[DEBUG] Retrieved initial batch of {len(batch)} tweets")
+            logger.debug("Retrieved initial batch of %s tweets", len(batch))
             
             # Continue fetching using .next until we reach max_tweets
             while len(tweets) < max_tweets:
                 # Add random delay between 0-5 seconds to avoid rate limits
                 delay = random.uniform(0, 5)
-                print(f"[DEBUG] Adding random delay of {delay:.2f} seconds before fetching next batch")
-                time.sleep(delay)
+                logger.debug("Adding random delay of %.2f seconds before fetching next batch", delay)
+                await asyncio.sleep(delay)
                 
                 try:
                     batch = await batch.next()
                 except TooManyRequests as e:
-                    # rate_limit_reset = datetime.fromtimestamp(e.rate_limit_reset)
-                    print(f"[DEBUG] Rate limit exceeded. Resetting at {datetime.now()}")
-                    # wait_time = (rate_limit_reset - datetime.now()).total_seconds()
-                    time.sleep(100)
+                    wait_time = rate_limit_wait(e)
+                    logger.warning("Rate limit exceeded. Waiting %.0f seconds", wait_time)
+                    await asyncio.sleep(wait_time)
                     continue
 
                 if batch:
                     tweets.extend(batch)
-                    print(f"[DEBUG] Retrieved additional batch, total tweets now: {len(tweets)}")
+                    logger.debug("Retrieved additional batch, total tweets now: %s", len(tweets))
                 else:
-                    print(f"[DEBUG] No more tweets available after {len(tweets)} tweets")
+                    logger.debug("No more tweets available after %s tweets", len(tweets))
                     break
                 
                 # Break if we've reached or exceeded max_tweets
                 if len(tweets) >= max_tweets or batch.next:
-                    print(f"[DEBUG] Reached maximum tweet count: {max_tweets}")
+                    logger.debug("Reached maximum tweet count: %s", max_tweets)
                     tweets = tweets[:max_tweets]  # Trim to max_tweets
                     break
         
-        print(f"[DEBUG] Retrieved a total of {len(tweets)} tweets for user {username}")
-        
-        # Prepare CSV file
-        file_path = f'{username}_tweets_and_replies_temp.csv'
-        print(f"[DEBUG] Creating CSV file: {file_path}")
-        with open(file_path, 'w', newline='', encoding='utf-8') as file:
-            writer = csv.writer(file)
-            writer.writerow(['Tweet ID', 'Username', 'Text', 'Created At', 'Type', 'Sentiment', 'Score'])
-            
-            # Iterate through each tweet
-            for tweet in tweets:
-                # Write original tweet
-                tweet_data = get_tweet_data(tweet)
-                writer.writerow([
-                    tweet_data['id'],
-                    tweet_data['username'],
-                    tweet_data['text'],
-                    tweet_data['created_at'],
-                    'Post',
-                    map_sentiment_label(tweet_data['sentiment']),
-                    tweet_data['score']
-                ])
-                print(f"[DEBUG] Added tweet {tweet.id} to CSV")
-                
-                # Fetch and write replies for this tweet using the get_replies_for_tweet function
-                print(f"[DEBUG] Fetching replies for tweet {tweet.id}")
-                replies = await get_replies_for_tweet(tweet.id)
-                print(f"[DEBUG] Retrieved {len(replies)} direct replies for tweet {tweet.id}")
-                
-                for reply in replies:
-                    writer.writerow([
-                        reply['id'],
-                        reply['username'],
-                        reply['text'],
-                        reply['created_at'],
-                        'Reply',
-                        reply['sentiment'],
-                        reply['score']
-                    ])
-                    print(f"[DEBUG] Added reply {reply['id']} to CSV")
+        logger.debug("Retrieved a total of %s tweets for user %s", len(tweets), username)
         
-        print(f"[DEBUG] CSV file created successfully: {file_path}")
-        return file_path
+        # Collect tweets and their replies in memory
+        rows = []
+        replies_per_tweet = await get_replies_for_tweets([tweet.id for tweet in tweets])
+        for tweet, tweet_data, replies in zip(tweets, await get_tweets_data(tweets), replies_per_tweet):
+            rows.append({
+                'id': tweet_data['id'],
+                'username': tweet_data['username'],
+                'text': tweet_data['text'],
+                'created_at': tweet_data['created_at'],
+                'type': 'Post',
+                'sentiment': tweet_data['sentiment'],
+                'score': tweet_data['score']
+            })
+            logger.debug("Added tweet %s", tweet.id)
+
+            logger.debug("Retrieved %s direct replies for tweet %s", len(replies), tweet.id)
+
+            for reply in replies:
+                rows.append({
+                    'id': reply['id'],
+                    'username': reply['username'],
+                    'text': reply['text'],
+                    'created_at': reply['created_at'],
+                    'type': 'Reply',
+                    'sentiment': reply['sentiment'],
+                    'score': reply['score']
+                })
+
+        logger.debug("Collected %s tweets and replies for user %s", len(rows), username)
+        return rows
     except Exception as e:
-        print(f"[DEBUG] Error in fetch_user_tweets_and_replies: {e}")
-        logger.error(f"Error in fetch_user_tweets_and_replies: {e}")
+        logger.error("Error in fetch_user_tweets_and_replies: %s", e)
         return None
\ No newline at end of file
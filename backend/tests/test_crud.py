@@ -0,0 +1,124 @@
+# backend/tests/test_crud.py
+import unittest
+from datetime import datetime
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+from db import crud
+
+
+class PeriodLabelTest(unittest.TestCase):
+    def test_monthly_label(self):
+        self.assertEqual(crud._period_label("2025-01-01T00:00:00+00:00", "monthly"), "2025-01")
+
+    def test_weekly_label_at_year_boundary(self):
+        # 2025-01-02 falls in the week date_trunc('week') starts on Monday 2024-12-30, i.e. ISO week 2025-W01
+        self.assertEqual(crud._period_label("2024-12-30T00:00:00+00:00", "weekly"), "2025-W01")
+        self.assertEqual(crud._period_label("2024-12-23T00:00:00+00:00", "weekly"), "2024-W52")
+
+
+class SentimentDistributionTest(unittest.TestCase):
+    def setUp(self):
+        crud._aggregate_cache.clear()
+
+    def test_weekly_distribution_at_year_boundary(self):
+        supabase = MagicMock()
+        supabase.rpc.return_value.execute.return_value.data = [
+            {"period": "2024-12-23T00:00:00+00:00", "sentiment": "negative", "tweet_count": 1},
+            {"period": "2024-12-30T00:00:00+00:00", "sentiment": "positive", "tweet_count": 3},
+            {"period": "2024-12-30T00:00:00+00:00", "sentiment": "neutral", "tweet_count": 1},
+        ]
+
+        distribution = crud.get_monthly_sentiment_distribution(supabase, "user", "weekly")
+
+        self.assertEqual(
+            [(row["time_period"], row["total_tweets"]) for row in distribution["data"]],
+            [("2024-W52", 1), ("2025-W01", 4)],
+        )
+        self.assertEqual(distribution["data"][1]["positive_ratio"], 0.75)
+
+
+class FakeQuery:
+    """Applies the PostgREST filters used by crud to in-memory rows."""
+
+    def __init__(self, rows):
+        self.rows = list(rows)
+        self.negate = False
+
+    def _column(self, row, column):
+        if "->>" in column:
+            column, key = column.split("->>")
+            return (row.get(column) or {}).get(key)
+        return row.get(column)
+
+    def _filter(self, predicate):
+        negate, self.negate = self.negate, False
+        self.rows = [row for row in self.rows if predicate(row) != negate]
+        return self
+
+    @property
+    def not_(self):
+        self.negate = True
+        return self
+
+    def select(self, columns):
+        return self
+
+    def eq(self, column, value):
+        return self._filter(lambda row: self._column(row, column) == value)
+
+    def gte(self, column, value):
+        return self._filter(lambda row: self._column(row, column) >= value)
+
+    def lt(self, column, value):
+        return self._filter(lambda row: self._column(row, column) < value)
+
+    def is_(self, column, value):
+        assert value == "null"
+        return self._filter(lambda row: self._column(row, column) is None)
+
+    def order(self, column, desc=False):
+        self.rows.sort(key=lambda row: row[column], reverse=desc)
+        return self
+
+    def limit(self, size):
+        self.rows = self.rows[:size]
+        return self
+
+    def execute(self):
+        return SimpleNamespace(data=self.rows)
+
+
+class FetchLatestAnalysisTest(unittest.TestCase):
+    def setUp(self):
+        self.now = datetime.now().replace(microsecond=0)
+
+    def fetch(self, rows):
+        supabase = MagicMock()
+        supabase.table.return_value = FakeQuery(rows)
+        return crud.fetch_latest_tweets_by_username(supabase, "user")
+
+    def analysis(self, analysis_id, tweet_count, query_parameters=None, second=0):
+        return {
+            "analysis_id": analysis_id,
+            "username": "user",
+            "analysis_timestamp": self.now.replace(second=second).isoformat(),
+            "tweet_count": tweet_count,
+            "query_parameters": query_parameters or {"max_tweets": 10},
+        }
+
+    def test_returns_finished_analysis(self):
+        self.assertEqual(self.fetch([self.analysis(1, 12)])["analysis_id"], 1)
+
+    def test_skips_in_flight_and_failed_analyses(self):
+        # create_analysis inserts the row before any tweets are fetched; tweet_count stays NULL until it finishes
+        rows = [self.analysis(1, 12, second=0), self.analysis(2, None, second=30)]
+        self.assertEqual(self.fetch(rows)["analysis_id"], 1)
+        self.assertIsNone(self.fetch([self.analysis(2, None)]))
+
+    def test_skips_analyze_runs(self):
+        self.assertIsNone(self.fetch([self.analysis(1, 12, query_parameters={"count": 10})]))
+
+
+if __name__ == "__main__":
+    unittest.main()
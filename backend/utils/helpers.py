@@ -1,12 +1,25 @@
 # backend/app/utils/helpers.py
 # Add helper functions as you go.
+from datetime import datetime
+from typing import Optional
+
+# Labels of cardiffnlp/twitter-roberta-base-sentiment
+SENTIMENT_LABELS = {
+    "LABEL_0": "negative",
+    "LABEL_1": "neutral",
+    "LABEL_2": "positive",
+}
 
 def map_sentiment_label(label: str) -> str:
     """Maps the sentiment label from the model to a consistent format."""
-    if label == "LABEL_0":
-        return "negative"
-    elif label == "LABEL_1":
-        return "neutral"
-    elif label == "LABEL_2":
-        return "positive"
-    return "unknown"
\ No newline at end of file
+    return SENTIMENT_LABELS.get(label, "unknown")
+
+# Format of created_at on Twitter's legacy tweet data, e.g. "Wed Oct 10 20:19:24 +0000 2018"
+TWITTER_TIMESTAMP_FORMAT = "%a %b %d %H:%M:%S %z %Y"
+
+def parse_tweet_timestamp(created_at: str) -> Optional[datetime]:
+    """Parses a tweet's created_at, or returns None when it is missing or malformed."""
+    try:
+        return datetime.strptime(created_at, TWITTER_TIMESTAMP_FORMAT)
+    except (TypeError, ValueError):
+        return None